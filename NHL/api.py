@@ -1,11 +1,19 @@
 # api.py
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, TypedDict
 
+import numpy as np
+import sklearn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, ConfigDict
 
 from bet_tracker import (
@@ -15,29 +23,67 @@ from bet_tracker import (
     DEFAULT_MIN_VALUE,
     DEFAULT_MAX_ODDS,
 )
-from live.nhl_api import get_team_recent_games
-from live.nt_odds import get_nhl_matches_range
+from live.nhl_api import (
+    clear_recent_games_cache,
+    close_session as close_nhl_session,
+    get_team_recent_games,
+)
+from live.nt_odds import (
+    clear_matches_cache,
+    close_session as close_nt_session,
+    get_nhl_matches_range,
+)
 from live.form_engine import (
     compute_stats_from_games,
     format_recent_games,
 )
-from live.live_feature_builder import build_live_features
+from live.live_feature_builder import (
+    build_live_features,
+    build_live_features_batch,
+    feature_frame,
+    resolve_team_id,
+)
 from live.team_cache import (
     get_cached_team_games as get_from_cache,
     cache_team_games,
     clear_team_cache,
 )
 from utils.data_loader import load_team_mappings
-from utils.feature_engineering import DEFAULT_WINDOWS
-from utils.model_utils import load_model
-from utils.value_utils import expected_value, implied_probability, odds_complete, round_optional
+from utils.feature_engineering import DEFAULT_WINDOWS, get_feature_columns
+from utils.model_utils import (
+    check_feature_columns,
+    load_model,
+    outcome_class_indices,
+    outcome_probs_matrix,
+    probs_by_outcome,
+)
+from utils.value_utils import (
+    OUTCOME_KEYS,
+    evaluate_value_matrix,
+    optional_float,
+    round_optional,
+)
 from utils.team_alias import to_canonical, to_display
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_PATH = BASE_DIR / "data" / "team_info.csv"
 MODEL_PATH = BASE_DIR / "models" / "nhl_model.pkl"
 
-app = FastAPI(title="NHL Prediction API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Lukk delte HTTP-sesjoner mot NHL API og Norsk Tipping ved nedstenging
+    close_nhl_session()
+    close_nt_session()
+
+
+# orjson er vesentlig raskere enn stdlib json for de store value-/portefølje-listene
+app = FastAPI(
+    title="NHL Prediction API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 DEFAULT_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -63,31 +109,83 @@ app.add_middleware(
 
 LABELS = ["Home Win", "OT / SO", "Away Win"]
 
+# Feature-radene bygges av oss og inneholder aldri NaN/inf, så vi hopper over sjekken i predict
+sklearn.set_config(assume_finite=True)
+
+# Hvor lenge modell/lag-mapping holdes i minnet før de lastes på nytt (sekunder)
+DATA_CACHE_TTL = float(os.environ.get("DATA_CACHE_TTL", "3600"))
+
 # Cache for å unngå å laste data på nytt for hver request
-_cache = {}
+_cache: Dict[str, Dict] = {}
+_cache_lock = threading.Lock()
 
 
-def get_data():
-    """Henter og cacher data"""
-    if "data" not in _cache:
-        id_to_abbr, abbr_to_id = load_team_mappings(str(DATA_PATH))
-        model = load_model(str(MODEL_PATH))
+def _model_mtime() -> Optional[float]:
+    try:
+        return MODEL_PATH.stat().st_mtime
+    except OSError:
+        return None
+
+
+def _is_fresh(data: Dict) -> bool:
+    """Cachen er gyldig til TTL er ute eller modellfilen er byttet ut."""
+    if time.time() - data["loaded_at"] > DATA_CACHE_TTL:
+        return False
+    return data["model_mtime"] == _model_mtime()
+
+
+def _build_teams_list(abbr_to_id: Dict[str, int]) -> List[Dict[str, str]]:
+    """Ferdig /teams-respons; mappingen endres ikke mellom innlastinger."""
+    teams = []
+    seen = set()
+    for abbr in sorted(abbr_to_id.keys()):
+        display_abbr = to_display(abbr)
+        if display_abbr in seen:
+            continue  # unngå duplikater (f.eks. ARI -> UTA)
+        seen.add(display_abbr)
+        teams.append({
+            "abbreviation": display_abbr,
+            "id": str(abbr_to_id[abbr])
+        })
+    return teams
+
+
+def _warm_up_model(model) -> None:
+    """Kjører en dummy-prediksjon slik at første ekte request slipper oppstartskostnaden."""
+    try:
+        model.predict_proba(feature_frame(np.zeros((1, model.n_features_in_), dtype=np.float32)))
+    except Exception as exc:  # pragma: no cover - warm-up skal aldri stoppe API-et
+        print(f"Warm-up av modellen feilet: {exc}")
 
-        _cache["data"] = {
-            "id_to_abbr": id_to_abbr,
-            "abbr_to_id": abbr_to_id,
-            "model": model,
-        }
-    return _cache["data"]
 
+def get_data():
+    """Henter og cacher data (lastes på nytt etter DATA_CACHE_TTL eller ny modellfil)"""
+    data = _cache.get("data")
+    if data is not None and _is_fresh(data):
+        return data
+
+    # Lås slik at samtidige requests ved kaldstart ikke laster alt to ganger
+    with _cache_lock:
+        data = _cache.get("data")
+        if data is None or not _is_fresh(data):
+            id_to_abbr, abbr_to_id = load_team_mappings(str(DATA_PATH))
+            model = check_feature_columns(
+                load_model(str(MODEL_PATH)), get_feature_columns(DEFAULT_WINDOWS)
+            )
+
+            _warm_up_model(model)
 
-def normalize_probs(*probs: Optional[float]):
-    """Sørger for at sannsynlighetene summerer til 1."""
-    clean = [p if p is not None else 0.0 for p in probs]
-    total = sum(clean)
-    if total <= 0:
-        return tuple(0.0 for _ in clean)
-    return tuple(p / total for p in clean)
+            data = {
+                "id_to_abbr": id_to_abbr,
+                "abbr_to_id": abbr_to_id,
+                "teams_list": _build_teams_list(abbr_to_id),
+                "model": model,
+                "class_indices": outcome_class_indices(model),
+                "loaded_at": time.time(),
+                "model_mtime": _model_mtime(),
+            }
+            _cache["data"] = data
+    return data
 
 
 def prob_to_decimal_odds(prob: float) -> Optional[float]:
@@ -97,12 +195,24 @@ def prob_to_decimal_odds(prob: float) -> Optional[float]:
     return round(1 / prob, 2)
 
 
+@lru_cache(maxsize=2048)
+def _parse_start(raw_start: str):
+    """Returnerer (dato, ISO-starttid); samme kampstrenger går igjen i hver refresh."""
+    try:
+        # Python < 3.11 godtar ikke "Z"-suffiks i fromisoformat
+        start_dt = datetime.fromisoformat(raw_start.replace("Z", "+00:00"))
+    except ValueError:
+        return "", raw_start
+    return start_dt.strftime("%Y-%m-%d"), start_dt.isoformat()
+
+
 class PredictionRequest(BaseModel):
     home_team: str
     away_team: str
 
 
 class GameInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
     date: str
     venue: str  # "H" or "A"
     result: str  # "W" or "L"
@@ -112,6 +222,7 @@ class GameInfo(BaseModel):
 
 
 class TeamStats(BaseModel):
+    model_config = ConfigDict(frozen=True)
     goals_for_avg: float
     goals_against_avg: float
     wins: int
@@ -133,7 +244,35 @@ class PredictionResponse(BaseModel):
 
 
 class ValueGameResponse(BaseModel):
-    model_config = ConfigDict(protected_namespaces=())
+    model_config = ConfigDict(protected_namespaces=(), frozen=True)
+    event_id: str
+    date: str
+    start_time: str
+    home: str
+    away: str
+    home_abbr: Optional[str]
+    away_abbr: Optional[str]
+    odds_home: Optional[float]
+    odds_draw: Optional[float]
+    odds_away: Optional[float]
+    model_home_win: float
+    model_draw: float
+    model_away_win: float
+    model_home_odds: Optional[float]
+    model_draw_odds: Optional[float]
+    model_away_odds: Optional[float]
+    implied_home_prob: Optional[float]
+    implied_draw_prob: Optional[float]
+    implied_away_prob: Optional[float]
+    value_home: Optional[float]
+    value_draw: Optional[float]
+    value_away: Optional[float]
+    best_value: Optional[str]
+    best_value_delta: Optional[float]
+
+
+class ValueGameDict(TypedDict):
+    """Samme felter som ValueGameResponse; /value-report bygger disse direkte uten validering."""
     event_id: str
     date: str
     start_time: str
@@ -225,19 +364,7 @@ def read_root():
 @app.get("/teams", response_model=List[Dict[str, str]])
 def get_teams():
     """Returnerer liste over alle tilgjengelige lag"""
-    data = get_data()
-    teams = []
-    seen = set()
-    for abbr in sorted(data["abbr_to_id"].keys()):
-        display_abbr = to_display(abbr)
-        if display_abbr in seen:
-            continue  # unngå duplikater (f.eks. ARI -> UTA)
-        seen.add(display_abbr)
-        teams.append({
-            "abbreviation": display_abbr,
-            "id": str(data["abbr_to_id"][abbr])
-        })
-    return teams
+    return get_data()["teams_list"]
 
 
 @app.post("/predict", response_model=PredictionResponse)
@@ -268,8 +395,12 @@ def predict_game(request: PredictionRequest):
         return primary
 
     try:
-        home_recent = _recent_with_alias(home_abbr_raw)
-        away_recent = _recent_with_alias(away_abbr_raw)
+        # Hjemme- og bortelag er uavhengige HTTP-kall, så de hentes samtidig
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            home_future = pool.submit(_recent_with_alias, home_abbr_raw)
+            away_future = pool.submit(_recent_with_alias, away_abbr_raw)
+            home_recent = home_future.result()
+            away_recent = away_future.result()
     except Exception as exc:  # pragma: no cover - beskytter API-et
         raise HTTPException(
             status_code=502, detail=f"Feil ved henting av kamper: {exc}"
@@ -295,16 +426,17 @@ def predict_game(request: PredictionRequest):
         windows=DEFAULT_WINDOWS,
         home_games=home_recent,
         away_games=away_recent,
+        abbr_to_id=data["abbr_to_id"],
     )
 
     probs = data["model"].predict_proba(feature_row)[0]
     pred_idx = probs.argmax()
     pred_class = data["model"].classes_[pred_idx]
-    class_prob_map = dict(zip(data["model"].classes_, probs))
+    home_p, ot_p, away_p = probs_by_outcome(probs, data["class_indices"])
 
-    prob_home_win = round(float(class_prob_map.get(0, 0.0)), 3)
-    prob_ot = round(float(class_prob_map.get(1, 0.0)), 3)
-    prob_away_win = round(float(class_prob_map.get(2, 0.0)), 3)
+    prob_home_win = round(home_p, 3)
+    prob_ot = round(ot_p, 3)
+    prob_away_win = round(away_p, 3)
 
     label_idx = int(pred_class) if isinstance(pred_class, (int, float)) else pred_idx
     prediction_label = LABELS[label_idx] if 0 <= label_idx < len(LABELS) else str(pred_class)
@@ -323,7 +455,46 @@ def predict_game(request: PredictionRequest):
     )
 
 
-@app.get("/value-report", response_model=List[ValueGameResponse])
+# Serveren bygger radene selv, så vi hopper over pydantic-validering per rad;
+# ValueGameResponse beholdes som dokumentert skjema.
+def _predict_value_rows(model, valid_games: List[tuple], team_games: Dict[str, List], abbr_to_id: Dict[str, int]):
+    """
+    Feature-matrise (build_live_features_batch) og predict_proba for alle kampene i én
+    omgang. Feiler det, prøves kampene én og én, og kamper som feiler hoppes over,
+    så én dårlig kamp ikke velter hele rapporten.
+    Returnerer (beholdte kamper, sannsynligheter for dem).
+    """
+    def predict(entries: List[tuple]) -> np.ndarray:
+        X = build_live_features_batch(
+            [away_canon for _, _, away_canon in entries],
+            [home_canon for _, home_canon, _ in entries],
+            windows=DEFAULT_WINDOWS,
+            team_games=team_games,
+            abbr_to_id=abbr_to_id,
+        )
+        return model.predict_proba(feature_frame(X))
+
+    try:
+        return valid_games, predict(valid_games)
+    except Exception as exc:  # pragma: no cover - beskytter API-et
+        print(f"Feature/prediksjon feilet for hele rapporten ({exc}), prøver kamp for kamp")
+
+    kept: List[tuple] = []
+    probs: List[np.ndarray] = []
+    for entry in valid_games:
+        try:
+            probs.append(predict([entry])[0])
+        except Exception as exc:  # pragma: no cover - beskytter API-et
+            game = entry[0]
+            print(f"Skipper kamp {game.get('home_abbr')} vs {game.get('away_abbr')}: {exc}")
+            continue
+        kept.append(entry)
+    if not probs:
+        return kept, np.empty((0, len(model.classes_)))
+    return kept, np.vstack(probs)
+
+
+@app.get("/value-report", responses={200: {"model": List[ValueGameResponse]}})
 def get_value_report(days: int = 3):
     """
     Returnerer kamper for de neste `days` dagene med modell-sannsynlighet,
@@ -332,12 +503,12 @@ def get_value_report(days: int = 3):
     # Begrens antall dager for å unngå unødvendig store kall
     days = max(0, min(days, 10))
     
-    import time
     start_total = time.time()
     print(f"\n=== VALUE REPORT START (days={days}) ===")
     
     data = get_data()
     model = data["model"]
+    class_indices = data["class_indices"]
 
     start_fetch = time.time()
     try:
@@ -374,9 +545,26 @@ def get_value_report(days: int = 3):
             team_games_cache[cache_key] = None
         return team_games_cache[cache_key]
     
-    results: List[ValueGameResponse] = []
+    results: List[ValueGameDict] = []
     
     start_processing = time.time()
+
+    # Hent kamper for alle unike lag parallelt (I/O-bundet); løkka under leser fra minnecachen
+    unique_teams: Dict[str, str] = {}
+    for game in games:
+        for abbr in (game.get("home_abbr"), game.get("away_abbr")):
+            if abbr:
+                unique_teams.setdefault(to_canonical(abbr), abbr)
+    start_teams = time.time()
+    if unique_teams:
+        with ThreadPoolExecutor(max_workers=min(8, len(unique_teams))) as pool:
+            list(pool.map(get_cached_team_games, unique_teams.values()))
+    print(f"Fetched games for {len(unique_teams)} teams in {time.time() - start_teams:.2f}s")
+
+    # 1. Finn gyldige kamper og samle kampene per lag til feature-matrisen
+    abbr_to_id = data["abbr_to_id"]
+    team_games: Dict[str, List] = {}
+    valid_games: List[tuple] = []
     for i, game in enumerate(games):
         home_abbr = game.get("home_abbr")
         away_abbr = game.get("away_abbr")
@@ -399,65 +587,61 @@ def get_value_report(days: int = 3):
             print(f"  [{i+1}/{len(games)}] SKIP {home_abbr} vs {away_abbr} (no data)")
             continue
 
-        start_features = time.time()
         try:
-            feature_row = build_live_features(
-                away_canon,
-                home_canon,
-                windows=DEFAULT_WINDOWS,
-                home_games=home_games,
-                away_games=away_games,
-            )
-            probs = model.predict_proba(feature_row)[0]
-            features_time = time.time() - start_features
-            print(f"  [{i+1}/{len(games)}] {home_abbr} vs {away_abbr}: cache={cache_time:.2f}s, features={features_time:.2f}s")
-        except Exception as exc:  # pragma: no cover - beskytter API-et
+            resolve_team_id(home_canon, abbr_to_id)
+            resolve_team_id(away_canon, abbr_to_id)
+        except ValueError as exc:
             print(f"Skipper kamp {home_abbr} vs {away_abbr}: {exc}")
             continue
+        print(f"  [{i+1}/{len(games)}] {home_abbr} vs {away_abbr}: cache={cache_time:.2f}s")
 
-        class_prob_map = dict(zip(model.classes_, probs))
-        home_prob, draw_prob, away_prob = normalize_probs(
-            float(class_prob_map.get(0, 0.0)),
-            float(class_prob_map.get(1, 0.0)),
-            float(class_prob_map.get(2, 0.0)),
-        )
+        team_games[home_canon] = home_games
+        team_games[away_canon] = away_games
+        valid_games.append((game, home_canon, away_canon))
+
+    # 2. Én feature-matrise (form regnes én gang per lag) og én predict_proba
+    if valid_games:
+        start_features = time.time()
+        valid_games, all_probs = _predict_value_rows(model, valid_games, team_games, abbr_to_id)
+        print(f"Predicted {len(valid_games)} games in {time.time() - start_features:.2f}s")
+    else:
+        all_probs = np.empty((0, len(class_indices)))
+
+    # 3. Normalisering, implied og EV for alle kampene med numpy
+    odds_matrix = np.array(
+        [[game.get("odds_home"), game.get("odds_draw"), game.get("odds_away")]
+         for game, *_ in valid_games],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    probs_norm, implied, values, best_idx = evaluate_value_matrix(
+        outcome_probs_matrix(all_probs, class_indices), odds_matrix
+    )
+
+    # 4. Bygg respons per kamp
+    for row, (game, *_) in enumerate(valid_games):
+        home_abbr = game.get("home_abbr")
+        away_abbr = game.get("away_abbr")
 
         odds_home = game.get("odds_home")
         odds_draw = game.get("odds_draw")
         odds_away = game.get("odds_away")
 
-        imp_home = implied_probability(odds_home)
-        imp_draw = implied_probability(odds_draw)
-        imp_away = implied_probability(odds_away)
-
-        odds_ok = odds_complete(odds_home, odds_draw, odds_away)
-        value_home = expected_value(home_prob, odds_home) if odds_ok else None
-        value_draw = expected_value(draw_prob, odds_draw) if odds_ok else None
-        value_away = expected_value(away_prob, odds_away) if odds_ok else None
-
-        value_map = {
-            "home": value_home,
-            "draw": value_draw,
-            "away": value_away,
-        }
-        available_values = {k: v for k, v in value_map.items() if v is not None}
+        home_prob, draw_prob, away_prob = (float(p) for p in probs_norm[row])
+        imp_home, imp_draw, imp_away = (optional_float(v) for v in implied[row])
+        value_home, value_draw, value_away = (optional_float(v) for v in values[row])
+
         best_value = None
         best_value_delta = None
-        if available_values and odds_ok:
-            best_value, best_value_delta = max(
-                available_values.items(), key=lambda kv: kv[1]
-            )
+        if best_idx[row] >= 0:
+            best_value = OUTCOME_KEYS[best_idx[row]]
+            best_value_delta = float(values[row, best_idx[row]])
 
         raw_start = game.get("startTime") or ""
-        try:
-            start_dt = datetime.fromisoformat(raw_start.replace("Z", "+00:00"))
-            date_str = start_dt.strftime("%Y-%m-%d")
-            start_time = start_dt.isoformat()
-        except Exception:
-            date_str = ""
-            start_time = raw_start if isinstance(raw_start, str) else ""
-
-        results.append(ValueGameResponse(
+        date_str, start_time = (
+            _parse_start(raw_start) if isinstance(raw_start, str) else ("", "")
+        )
+
+        results.append(ValueGameDict(
             event_id=str(game.get("eventId") or f"{home_abbr}-{away_abbr}-{start_time}"),
             date=date_str,
             start_time=start_time,
@@ -521,18 +705,33 @@ def trigger_portfolio_update(req: PortfolioUpdateRequest):
 
 
 # Alias-endepunkt for eldre/alternative ruter
-@app.get("/value_report", response_model=List[ValueGameResponse], include_in_schema=False)
+@app.get("/value_report", include_in_schema=False)
 def get_value_report_alias(days: int = 3):
     return get_value_report(days)
 
 
 @app.post("/cache/clear")
 def clear_cache():
-    """Tømmer team games cache (brukes ved behov for fresh data)."""
+    """Tømmer team games cache og korttids-cachene for odds/kamper (brukes ved behov for fresh data)."""
     clear_team_cache()
+    clear_recent_games_cache()
+    clear_matches_cache()
     return {"status": "ok", "message": "Team cache cleared"}
 
 
+@app.post("/admin/refresh-cache")
+def refresh_data_cache():
+    """Laster modell og lag-mapping på nytt uten å restarte serveren."""
+    with _cache_lock:
+        _cache.pop("data", None)
+    data = get_data()
+    return {
+        "status": "ok",
+        "loaded_at": datetime.fromtimestamp(data["loaded_at"]).isoformat(),
+        "model_mtime": data["model_mtime"],
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
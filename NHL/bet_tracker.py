@@ -9,18 +9,29 @@ Hovedfunksjoner:
 """
 from __future__ import annotations
 
-import csv
 import os
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 from datetime import date, datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from live.live_feature_builder import build_live_features
+import numpy as np
+import pandas as pd
+
+from live.live_feature_builder import build_live_features_batch, feature_frame, load_team_ids
 from live.nt_odds import get_nhl_matches_range
 from live.nhl_api import get_scoreboard
 from utils.feature_engineering import DEFAULT_WINDOWS
-from utils.model_utils import load_model
-from utils.value_utils import expected_value, implied_probability, odds_complete, round_optional
+from utils.model_utils import load_model_cached, outcome_class_indices, outcome_probs_matrix
+from utils.value_utils import (
+    OUTCOME_KEYS,
+    SELECTION_FIELDS,
+    evaluate_value_matrix,
+    odds_complete,
+    round_optional,
+)
 
 BASE_DIR = Path(__file__).resolve().parent
 BET_HISTORY_PATH = BASE_DIR / "data" / "bet_history.csv"
@@ -56,14 +67,6 @@ BET_FIELDS = [
 ]
 
 
-def normalize_probs(*probs: Optional[float]) -> Tuple[float, ...]:
-    clean = [p if p is not None else 0.0 for p in probs]
-    total = sum(clean)
-    if total <= 0:
-        return tuple(0.0 for _ in clean)
-    return tuple(p / total for p in clean)
-
-
 def _parse_iso(dt: Optional[str]) -> Optional[datetime]:
     if not dt:
         return None
@@ -73,6 +76,15 @@ def _parse_iso(dt: Optional[str]) -> Optional[datetime]:
         return None
 
 
+def _date_prefix(value: Any) -> Optional[str]:
+    """Returnerer "YYYY-MM-DD" når strengen starter med en slik dato, uten å parse hele tidspunktet."""
+    if isinstance(value, str) and len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        head = value[:10]
+        if head[:4].isdigit() and head[5:7].isdigit() and head[8:10].isdigit():
+            return head
+    return None
+
+
 def normalize_event_id(
     raw_event_id: Any,
     home_abbr: Optional[str],
@@ -85,7 +97,15 @@ def normalize_event_id(
       - numeric ids får fjernet .0
       - ellers faller vi tilbake til H-A-YYYY-MM-DD når mulig
     """
+    if isinstance(raw_event_id, float) and raw_event_id.is_integer():
+        return str(int(raw_event_id))
     raw_str = str(raw_event_id).strip() if raw_event_id is not None else ""
+    # Vanligste tilfelle: ren heltalls-id («123456»). Ledende nuller og svært lange
+    # id'er går via float() under slik at resultatet blir som før.
+    if 0 < len(raw_str) <= 15 and raw_str.isascii() and raw_str.isdigit() and (
+        raw_str[0] != "0" or len(raw_str) == 1
+    ):
+        return raw_str
     if raw_str:
         try:
             as_float = float(raw_str)
@@ -109,45 +129,85 @@ def normalize_event_id(
     return raw_str or str(raw_event_id or "").strip()
 
 
+NUMERIC_FIELDS = ("stake", "odds", "model_prob", "implied_prob", "value", "payout", "profit")
+
+
 def _read_csv(path: Path) -> List[Dict[str, Any]]:
     if not path.exists():
         return []
-    rows: List[Dict[str, Any]] = []
-    with open(path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for raw in reader:
-            row: Dict[str, Any] = dict(raw)
-            row["stake"] = float(row.get("stake") or 0.0)
-            row["odds"] = float(row.get("odds") or 0.0)
-            row["model_prob"] = float(row.get("model_prob") or 0.0)
-            row["implied_prob"] = float(row.get("implied_prob") or 0.0)
-            row["value"] = float(row.get("value") or 0.0)
-            row["payout"] = float(row.get("payout") or 0.0)
-            row["profit"] = float(row.get("profit") or 0.0)
-            rows.append(row)
-    return rows
+    # Tekstkolonner leses som str ("" for tomme felter); tallkolonner parses i C.
+    # round_trip gir samme float-verdier som Pythons float().
+    dtype = defaultdict(lambda: str, {field: "float64" for field in NUMERIC_FIELDS})
+    try:
+        df = pd.read_csv(
+            path,
+            dtype=dtype,
+            keep_default_na=False,
+            na_values={field: [""] for field in NUMERIC_FIELDS},
+            float_precision="round_trip",
+            encoding="utf-8",
+        )
+    except pd.errors.EmptyDataError:
+        return []
+    for field in NUMERIC_FIELDS:
+        df[field] = df[field].fillna(0.0) if field in df.columns else 0.0
+    return df.to_dict("records")
+
+
+def _history_frame(rows: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(
+        [{field: row.get(field, "") for field in BET_FIELDS} for row in rows],
+        columns=BET_FIELDS,
+    )
+    for field in ("implied_prob", "value"):
+        df[field] = [round_optional(v, 5) for v in df[field]]
+    return df
 
 
 def _write_csv(path: Path, rows: Sequence[Dict[str, Any]]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=BET_FIELDS)
-        writer.writeheader()
-        for row in rows:
-            formatted = {field: row.get(field, "") for field in BET_FIELDS}
-            formatted["implied_prob"] = round_optional(formatted.get("implied_prob"), 5)
-            formatted["value"] = round_optional(formatted.get("value"), 5)
-            writer.writerow(formatted)
+    # \r\n som csv-modulen skrev tidligere, så historikk-diffene i git ikke endres
+    _history_frame(rows).to_csv(path, index=False, encoding="utf-8", lineterminator="\r\n")
 
 
 def load_history(path: Path = BET_HISTORY_PATH) -> List[Dict[str, Any]]:
     return _read_csv(path)
 
 
-def save_history(rows: Sequence[Dict[str, Any]], path: Path = BET_HISTORY_PATH) -> None:
+def rewrite_history(rows: Sequence[Dict[str, Any]], path: Path = BET_HISTORY_PATH) -> None:
+    """Skriver hele historikken på nytt (nødvendig når eksisterende rader er endret)."""
     _write_csv(path, rows)
 
 
+# Bakoverkompatibelt navn
+save_history = rewrite_history
+
+
+def append_new_bets(new_rows: Sequence[Dict[str, Any]], path: Path = BET_HISTORY_PATH) -> bool:
+    """
+    Legger kun nye rader til slutt i filen i stedet for å skrive hele historikken.
+    Returnerer False hvis filens header ikke matcher BET_FIELDS; da må kalleren bruke rewrite_history.
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        _write_csv(path, new_rows)
+        return True
+    if not new_rows:
+        return True
+
+    with open(path, "rb") as f:
+        header = f.readline().rstrip(b"\r\n").decode("utf-8-sig")
+        f.seek(-1, os.SEEK_END)
+        ends_with_newline = f.read(1) == b"\n"
+    if header.split(",") != BET_FIELDS:
+        return False
+
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        if not ends_with_newline:
+            f.write("\r\n")
+        _history_frame(new_rows).to_csv(f, header=False, index=False, lineterminator="\r\n")
+    return True
+
+
 def _flatten_scoreboard_games(scoreboard: Dict[str, Any]) -> List[Dict[str, Any]]:
     if "gamesByDate" in scoreboard and scoreboard["gamesByDate"]:
         games: List[Dict[str, Any]] = []
@@ -157,64 +217,90 @@ def _flatten_scoreboard_games(scoreboard: Dict[str, Any]) -> List[Dict[str, Any]
     return scoreboard.get("games", []) or []
 
 
-def _lookup_result(game_date: str, home_abbr: str, away_abbr: str) -> Optional[Dict[str, Any]]:
-    def _canon(abbr: Optional[str]) -> Optional[str]:
-        if not abbr:
-            return None
-        abbr_up = str(abbr).upper()
-        return TEAM_ALIAS.get(abbr_up, abbr_up)
+def _canon_abbr(abbr: Optional[str]) -> Optional[str]:
+    if not abbr:
+        return None
+    abbr_up = str(abbr).upper()
+    return TEAM_ALIAS.get(abbr_up, abbr_up)
+
+
+def _index_scoreboard_games(
+    day_games: Sequence[Dict[str, Any]],
+) -> Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]]:
+    """(hjemme, borte) -> kamp, med kanoniske lagkoder. Første treff vinner, som i et lineært søk."""
+    index: Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]] = {}
+    for game in day_games:
+        key = (
+            _canon_abbr(game.get("homeTeam", {}).get("abbrev")),
+            _canon_abbr(game.get("awayTeam", {}).get("abbrev")),
+        )
+        index.setdefault(key, game)
+    return index
 
-    target_home = _canon(home_abbr)
-    target_away = _canon(away_abbr)
 
-    sb = get_scoreboard(game_date)
-    for game in _flatten_scoreboard_games(sb):
-        home = _canon(game.get("homeTeam", {}).get("abbrev"))
-        away = _canon(game.get("awayTeam", {}).get("abbrev"))
-        if home != target_home or away != target_away:
-            continue
+def _lookup_result(
+    game_date: str,
+    home_abbr: str,
+    away_abbr: str,
+    day_games: Optional[List[Dict[str, Any]]] = None,
+    day_index: Optional[Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Finn resultatet for en kamp. Send inn `day_index` (fra _index_scoreboard_games) eller
+    `day_games` (flatet scoreboard) for å gjenbruke datoens kamper.
+    """
+    if day_index is None:
+        if day_games is None:
+            day_games = _flatten_scoreboard_games(get_scoreboard(game_date))
+        day_index = _index_scoreboard_games(day_games)
 
-        state = (game.get("gameState") or "").upper()
-        if state not in {"OFF", "FINAL"}:
-            return {"finished": False}
-
-        home_goals = game.get("homeTeam", {}).get("score")
-        away_goals = game.get("awayTeam", {}).get("score")
-        if home_goals is None or away_goals is None:
-            return {"finished": False}
-
-        outcome_info = game.get("gameOutcome") or {}
-        last_period_type = str(outcome_info.get("lastPeriodType") or "").upper()
-        period_info = game.get("periodDescriptor") or {}
-        period_type = str(period_info.get("periodType") or "").upper()
-        period_number = game.get("period")
-        ot_in_use = bool(game.get("otInUse"))
-        so_in_use = bool(game.get("shootoutInUse"))
-
-        ended_in_extra = (
-            last_period_type in {"OT", "SO"}
-            or period_type in {"OT", "SO"}
-            or ot_in_use
-            or so_in_use
-            or (isinstance(period_number, int) and period_number > 3)
-        )
+    game = day_index.get((_canon_abbr(home_abbr), _canon_abbr(away_abbr)))
+    if game is None:
+        return None
+    return _game_result(game)
+
+
+def _game_result(game: Dict[str, Any]) -> Dict[str, Any]:
+    state = (game.get("gameState") or "").upper()
+    if state not in {"OFF", "FINAL"}:
+        return {"finished": False}
+
+    home_goals = game.get("homeTeam", {}).get("score")
+    away_goals = game.get("awayTeam", {}).get("score")
+    if home_goals is None or away_goals is None:
+        return {"finished": False}
+
+    outcome_info = game.get("gameOutcome") or {}
+    last_period_type = str(outcome_info.get("lastPeriodType") or "").upper()
+    period_info = game.get("periodDescriptor") or {}
+    period_type = str(period_info.get("periodType") or "").upper()
+    period_number = game.get("period")
+    ot_in_use = bool(game.get("otInUse"))
+    so_in_use = bool(game.get("shootoutInUse"))
+
+    ended_in_extra = (
+        last_period_type in {"OT", "SO"}
+        or period_type in {"OT", "SO"}
+        or ot_in_use
+        or so_in_use
+        or (isinstance(period_number, int) and period_number > 3)
+    )
 
-        if ended_in_extra:
-            outcome = "draw"  # 3-veis marked: uavgjort ved full tid selv om OT/SO avgjør vinner
-        elif home_goals > away_goals:
-            outcome = "home"
-        elif away_goals > home_goals:
-            outcome = "away"
-        else:
-            outcome = "draw"
-
-        return {
-            "finished": True,
-            "outcome": outcome,
-            "home_goals": home_goals,
-            "away_goals": away_goals,
-        }
-    return None
+    if ended_in_extra:
+        outcome = "draw"  # 3-veis marked: uavgjort ved full tid selv om OT/SO avgjør vinner
+    elif home_goals > away_goals:
+        outcome = "home"
+    elif away_goals > home_goals:
+        outcome = "away"
+    else:
+        outcome = "draw"
+
+    return {
+        "finished": True,
+        "outcome": outcome,
+        "home_goals": home_goals,
+        "away_goals": away_goals,
+    }
 
 
 def _choose_best_per_day(
@@ -222,7 +308,7 @@ def _choose_best_per_day(
     min_value: float = 0.0,
     max_odds: Optional[float] = None,
 ) -> List[Dict[str, Any]]:
-    best: Dict[str, Dict[str, Any]] = {}
+    candidates: List[Tuple[str, float, Dict[str, Any]]] = []
     for g in games:
         if not odds_complete(
             g.get("odds_home"),
@@ -236,13 +322,9 @@ def _choose_best_per_day(
         if max_odds is not None:
             selection = g.get("best_value") or g.get("selection")
             selection_key = str(selection).lower() if selection else ""
-            odds_lookup = {
-                "home": g.get("odds_home"),
-                "draw": g.get("odds_draw"),
-                "away": g.get("odds_away"),
-            }
+            fields = SELECTION_FIELDS.get(selection_key)
             try:
-                odds = float(odds_lookup.get(selection_key))
+                odds = float(g.get(fields[0])) if fields else None
             except (TypeError, ValueError):
                 odds = None
             if odds is None or odds >= max_odds:
@@ -250,11 +332,14 @@ def _choose_best_per_day(
         date_key = g.get("date") or g.get("start_time", "")[:10]
         if not date_key:
             continue
+        candidates.append((date_key, delta, g))
 
-        existing = best.get(date_key)
-        if existing is None or (delta > existing.get("best_value_delta", -1)):
-            best[date_key] = g
-    return list(best.values())
+    # Stabil sortering på dato + max per gruppe; ved likt delta beholdes første kamp
+    candidates.sort(key=itemgetter(0))
+    return [
+        max(group, key=itemgetter(1))[2]
+        for _, group in groupby(candidates, key=itemgetter(0))
+    ]
 
 
 def _build_value_report(days: int = 1) -> List[Dict[str, Any]]:
@@ -262,33 +347,52 @@ def _build_value_report(days: int = 1) -> List[Dict[str, Any]]:
     Lager et value-report tilsvarende /value-report endepunktet.
     Returnerer liste med dicts for enkel serialisering.
     """
-    model = load_model(str(MODEL_PATH))
+    model = load_model_cached(MODEL_PATH)
+    class_indices = outcome_class_indices(model)
     games = get_nhl_matches_range(days)
     report: List[Dict[str, Any]] = []
 
-    for game in games:
-        home_abbr = game.get("home_abbr")
-        away_abbr = game.get("away_abbr")
-        if not home_abbr or not away_abbr:
-            continue
-
-        feature_row = build_live_features(
-            away_abbr,
-            home_abbr,
+    valid_games = [g for g in games if g.get("home_abbr") and g.get("away_abbr")]
+    if not valid_games:
+        return report
+
+    # Kamper uten noen odds kan ikke gi value; de tas med i rapporten, men uten
+    # features og modellkall (ofte over halve listen tidlig på dagen)
+    priced_games = [
+        g for g in valid_games
+        if not (g.get("odds_home") is None and g.get("odds_draw") is None and g.get("odds_away") is None)
+    ]
+    # Rad i matrisene under per kamp med odds; kamper uten odds mangler her
+    matrix_row: Dict[int, int] = {}
+    if priced_games:
+        # Bygg alle feature-radene først og kjør én predict_proba for hele listen;
+        # siste kamper for hvert unike lag hentes parallelt inne i build_live_features_batch
+        features = build_live_features_batch(
+            [game["away_abbr"] for game in priced_games],
+            [game["home_abbr"] for game in priced_games],
             windows=DEFAULT_WINDOWS,
+            abbr_to_id=load_team_ids(),
         )
-        probs = model.predict_proba(feature_row)[0]
-        class_prob_map = dict(zip(model.classes_, probs))
-
-        home_prob, draw_prob, away_prob = normalize_probs(
-            float(class_prob_map.get(0, 0.0)),
-            float(class_prob_map.get(1, 0.0)),
-            float(class_prob_map.get(2, 0.0)),
+        all_probs = model.predict_proba(feature_frame(features))
+
+        # Normalisering, implied og EV for alle kamper i én vektorisert omgang
+        odds_matrix = np.array(
+            [[g.get("odds_home"), g.get("odds_draw"), g.get("odds_away")] for g in priced_games],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        probs_norm, implied, values, best_idx = evaluate_value_matrix(
+            outcome_probs_matrix(all_probs, class_indices), odds_matrix
         )
-
-        raw_imp_home = implied_probability(game.get("odds_home"))
-        raw_imp_draw = implied_probability(game.get("odds_draw"))
-        raw_imp_away = implied_probability(game.get("odds_away"))
+        # tolist() gir Python-floats; round() (ikke np.round) så verdiene blir som før
+        model_cols = probs_norm.tolist()
+        implied_cols = implied.tolist()
+        value_cols = values.tolist()
+        matrix_row = {id(game): i for i, game in enumerate(priced_games)}
+
+    no_model = [None, None, None]
+    for game in valid_games:
+        home_abbr = game.get("home_abbr")
+        away_abbr = game.get("away_abbr")
 
         odds_home = game.get("odds_home")
         odds_draw = game.get("odds_draw")
@@ -296,20 +400,17 @@ def _build_value_report(days: int = 1) -> List[Dict[str, Any]]:
 
         best_value = None
         best_value_delta = None
+        row = matrix_row.get(id(game))
+        if row is None:
+            model_probs = implied_probs = game_values = no_model
+        else:
+            model_probs = [round(v, 3) for v in model_cols[row]]
+            implied_probs = [None if v != v else round(v, 5) for v in implied_cols[row]]
+            game_values = [None if v != v else round(v, 5) for v in value_cols[row]]
+            if best_idx[row] >= 0:
+                best_value = OUTCOME_KEYS[best_idx[row]]
+                best_value_delta = float(values[row, best_idx[row]])
         odds_ok = odds_complete(odds_home, odds_draw, odds_away)
-        value_home = expected_value(home_prob, odds_home) if odds_ok else None
-        value_draw = expected_value(draw_prob, odds_draw) if odds_ok else None
-        value_away = expected_value(away_prob, odds_away) if odds_ok else None
-
-        available = {
-            "home": value_home,
-            "draw": value_draw,
-            "away": value_away,
-        }
-        available = {k: v for k, v in available.items() if v is not None}
-
-        if available and odds_ok:
-            best_value, best_value_delta = max(available.items(), key=lambda kv: kv[1])
 
         raw_start = game.get("startTime") or ""
         start_dt = _parse_iso(raw_start)
@@ -334,15 +435,15 @@ def _build_value_report(days: int = 1) -> List[Dict[str, Any]]:
             "odds_home": odds_home,
             "odds_draw": odds_draw,
             "odds_away": odds_away,
-            "model_home_win": round(home_prob, 3),
-            "model_draw": round(draw_prob, 3),
-            "model_away_win": round(away_prob, 3),
-            "implied_home_prob": round_optional(raw_imp_home, 5),
-            "implied_draw_prob": round_optional(raw_imp_draw, 5),
-            "implied_away_prob": round_optional(raw_imp_away, 5),
-            "value_home": round_optional(value_home, 5),
-            "value_draw": round_optional(value_draw, 5),
-            "value_away": round_optional(value_away, 5),
+            "model_home_win": model_probs[0],
+            "model_draw": model_probs[1],
+            "model_away_win": model_probs[2],
+            "implied_home_prob": implied_probs[0],
+            "implied_draw_prob": implied_probs[1],
+            "implied_away_prob": implied_probs[2],
+            "value_home": game_values[0],
+            "value_draw": game_values[1],
+            "value_away": game_values[2],
             "best_value": best_value,
             "best_value_delta": best_value_delta,
             "odds_complete": odds_ok,
@@ -351,7 +452,10 @@ def _build_value_report(days: int = 1) -> List[Dict[str, Any]]:
     return report
 
 
-def _build_bet_entry(game: Dict[str, Any], stake: float) -> Optional[Dict[str, Any]]:
+def _build_bet_entry(
+    game: Dict[str, Any], stake: float, now_iso: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """now_iso kan gis av kalleren slik at alle bets i samme kjøring får samme tidsstempel."""
     selection = game.get("best_value") or game.get("selection")
     if not selection:
         return None
@@ -361,6 +465,9 @@ def _build_bet_entry(game: Dict[str, Any], stake: float) -> Optional[Dict[str, A
     start_time = start_dt.isoformat() if start_dt else (raw_start if isinstance(raw_start, str) else "")
 
     date_str = game.get("date") or ""
+    if not date_str:
+        # ISO-strengen starter med datoen (tidssone endres ikke av fromisoformat)
+        date_str = _date_prefix(raw_start) or ""
     if not date_str and start_dt:
         date_str = start_dt.strftime("%Y-%m-%d")
     elif not date_str and isinstance(raw_start, str) and len(raw_start) >= 10:
@@ -375,32 +482,17 @@ def _build_bet_entry(game: Dict[str, Any], stake: float) -> Optional[Dict[str, A
 
     event_id = normalize_event_id(game.get("event_id"), home_abbr, away_abbr, start_time, date_str)
 
-    odds_lookup = {
-        "home": game.get("odds_home"),
-        "draw": game.get("odds_draw"),
-        "away": game.get("odds_away"),
-    }
-    model_lookup = {
-        "home": game.get("model_home_win"),
-        "draw": game.get("model_draw"),
-        "away": game.get("model_away_win"),
-    }
-    implied_lookup = {
-        "home": game.get("implied_home_prob"),
-        "draw": game.get("implied_draw_prob"),
-        "away": game.get("implied_away_prob"),
-    }
-    value_lookup = {
-        "home": game.get("value_home"),
-        "draw": game.get("value_draw"),
-        "away": game.get("value_away"),
-    }
+    fields = SELECTION_FIELDS.get(selection)
+    if fields is None:
+        return None
+    odds_field, model_field, implied_field, value_field = fields
 
-    odds = odds_lookup.get(selection)
+    odds = game.get(odds_field)
     if odds is None:
         return None
 
-    now_iso = datetime.utcnow().isoformat()
+    if now_iso is None:
+        now_iso = datetime.utcnow().isoformat()
     return {
         "date": date_str,
         "event_id": event_id,
@@ -409,9 +501,9 @@ def _build_bet_entry(game: Dict[str, Any], stake: float) -> Optional[Dict[str, A
         "away_abbr": away_abbr,
         "selection": selection,
         "odds": float(odds),
-        "model_prob": float(model_lookup.get(selection) or 0.0),
-        "implied_prob": float(round_optional(implied_lookup.get(selection), 5) or 0.0),
-        "value": float(round_optional(value_lookup.get(selection), 5) or 0.0),
+        "model_prob": float(game.get(model_field) or 0.0),
+        "implied_prob": float(round_optional(game.get(implied_field), 5) or 0.0),
+        "value": float(round_optional(game.get(value_field), 5) or 0.0),
         "stake": float(stake),
         "status": "pending",
         "payout": 0.0,
@@ -428,59 +520,80 @@ def settle_pending_bets(history: List[Dict[str, Any]]) -> int:
     Returnerer antall oppdaterte rader.
     """
     today = date.today()
+    now_iso = datetime.utcnow().isoformat()
     updated = 0
 
+    # Grupper ventende bets per dato slik at hver dato hentes og flates ut kun én gang
+    pending_by_date: Dict[str, List[Dict[str, Any]]] = {}
     for row in history:
         if row.get("status") != "pending":
             continue
 
         game_date_str = row.get("date")
+        if _date_prefix(game_date_str) != game_date_str:
+            continue  # kun rene YYYY-MM-DD-datoer kan slås opp i scoreboard
         try:
-            game_date = datetime.strptime(game_date_str, "%Y-%m-%d").date()
-        except Exception:
+            game_date = date.fromisoformat(game_date_str)
+        except ValueError:
             continue
 
         if game_date > today:
             continue  # kamp ikke spilt ennå
 
-        res = _lookup_result(game_date_str, row.get("home_abbr"), row.get("away_abbr"))
-        if not res or not res.get("finished"):
-            continue
+        pending_by_date.setdefault(game_date_str, []).append(row)
 
-        outcome = res.get("outcome")
-        row["actual_outcome"] = outcome
+    for game_date_str, rows in pending_by_date.items():
+        day_index = _index_scoreboard_games(_flatten_scoreboard_games(get_scoreboard(game_date_str)))
+        for row in rows:
+            res = _lookup_result(
+                game_date_str, row.get("home_abbr"), row.get("away_abbr"), day_index=day_index
+            )
+            if not res or not res.get("finished"):
+                continue
 
-        won = outcome == row.get("selection")
-        if won:
-            row["payout"] = round(row["stake"] * row["odds"], 2)
-            row["profit"] = round(row["payout"] - row["stake"], 2)
-            row["status"] = "won"
-        else:
-            row["payout"] = 0.0
-            row["profit"] = -row["stake"]
-            row["status"] = "lost"
+            outcome = res.get("outcome")
+            row["actual_outcome"] = outcome
 
-        row["updated_at"] = datetime.utcnow().isoformat()
-        updated += 1
+            won = outcome == row.get("selection")
+            if won:
+                row["payout"] = round(row["stake"] * row["odds"], 2)
+                row["profit"] = round(row["payout"] - row["stake"], 2)
+                row["status"] = "won"
+            else:
+                row["payout"] = 0.0
+                row["profit"] = -row["stake"]
+                row["status"] = "lost"
+
+            row["updated_at"] = now_iso
+            updated += 1
 
     return updated
 
 
 def _existing_keys(history: Sequence[Dict[str, Any]]) -> set:
-    keys = set()
+    # event_id lagres allerede normalisert av _build_bet_entry; eldre rader
+    # normaliseres én gang med migrate_event_ids (se data/clean_duplicates.py)
+    return {f"{row.get('event_id')}|{row.get('selection')}" for row in history}
+
+
+def migrate_event_ids(history: List[Dict[str, Any]]) -> int:
+    """
+    Skriver om event_id på eldre rader til normalisert form (H-A-YYYY-MM-DD / heltalls-id).
+    Returnerer antall rader som ble endret.
+    """
+    changed = 0
     for row in history:
-        selection = row.get("selection")
-        raw_event_id = row.get("event_id")
-        keys.add(f"{raw_event_id}|{selection}")
         norm_event_id = normalize_event_id(
-            raw_event_id,
+            row.get("event_id"),
             row.get("home_abbr"),
             row.get("away_abbr"),
             row.get("start_time"),
             row.get("date"),
         )
-        keys.add(f"{norm_event_id}|{selection}")
-    return keys
+        if norm_event_id != row.get("event_id"):
+            row["event_id"] = norm_event_id
+            changed += 1
+    return changed
 
 
 def record_new_bets(
@@ -514,10 +627,11 @@ def record_new_bets(
         candidates = _choose_best_per_day(report, min_value=min_value, max_odds=max_odds)
 
     existing_keys = _existing_keys(history)
+    now_iso = datetime.utcnow().isoformat()
     created = 0
 
     for game in candidates:
-        entry = _build_bet_entry(game, stake_per_bet)
+        entry = _build_bet_entry(game, stake_per_bet, now_iso=now_iso)
         if not entry:
             continue
         if max_odds is not None and entry.get("odds") is not None:
@@ -549,6 +663,7 @@ def update_daily_bets(
     take_all_prefetched=True legger til alle kamper over min_value (samme som API/frontend).
     """
     history = load_history(history_path)
+    previous_count = len(history)
     settled = settle_pending_bets(history)
     created = record_new_bets(
         history,
@@ -559,7 +674,9 @@ def update_daily_bets(
         prefetched_report=prefetched_report,
         take_all_prefetched=take_all_prefetched,
     )
-    save_history(history, history_path)
+    # Avregning endrer eksisterende rader; ellers holder det å legge til de nye
+    if settled or not append_new_bets(history[previous_count:], history_path):
+        rewrite_history(history, history_path)
     portfolio = build_portfolio_payload(history)
 
     return {
@@ -592,6 +709,17 @@ def build_portfolio_payload(history: Sequence[Dict[str, Any]]) -> Dict[str, Any]
     cumulative_payout = 0.0
     series: List[Dict[str, Any]] = []
 
+    # Ventende bets sortert på dato gir åpen innsats per dag i én sweep i stedet for
+    # et nytt søk gjennom hele historikken for hver dato (tom dato telles alltid som åpen)
+    pending = sorted(
+        ((b.get("date") or ""), b.get("stake", 0.0))
+        for b in history
+        if b.get("status") == "pending"
+    )
+    pending_idx = 0
+    open_stake = 0.0
+    open_bets_count = 0
+
     for d in all_dates:
         day_bets = grouped.get(d, [])
         day_stake = sum(b.get("stake", 0.0) for b in day_bets)
@@ -606,16 +734,11 @@ def build_portfolio_payload(history: Sequence[Dict[str, Any]]) -> Dict[str, Any]
         running_profit += day_profit
         cumulative_payout += day_payout
 
-        open_stake = sum(
-            b.get("stake", 0.0)
-            for b in history
-            if b.get("status") == "pending" and (b.get("date") or "") <= d
-        )
-        open_bets_count = sum(
-            1
-            for b in history
-            if b.get("status") == "pending" and (b.get("date") or "") <= d
-        )
+        # Åpne spill = ventende bets med dato <= d; pekeren flyttes kun fremover
+        while pending_idx < len(pending) and pending[pending_idx][0] <= d:
+            open_stake += pending[pending_idx][1]
+            open_bets_count += 1
+            pending_idx += 1
 
         series.append({
             "date": d,
@@ -1,5 +1,11 @@
 import csv
+import sys
 from collections import defaultdict
+from pathlib import Path
+
+# Gjør bet_tracker importerbar når scriptet kjøres fra data/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bet_tracker import migrate_event_ids
 
 def normalize_team(team):
     """ARI og UTA er samme lag"""
@@ -24,28 +30,25 @@ def read_bets():
 
 def remove_duplicates(bets):
     """Fjern duplikater basert på event_id, selection og date"""
+    # Kun dict-oppslag: en erstattet bet beholder plassen til første forekomst
     seen = {}
-    unique_bets = []
-    duplicates_removed = 0
     
     for bet in bets:
         # Lag en unik nøkkel basert på event_id, selection og date
         key = (bet['event_id'], bet['selection'], bet['date'])
         
-        if key not in seen:
+        existing = seen.get(key)
+        if existing is None:
+            seen[key] = bet
+            continue
+
+        # Hvis duplikat, behold den med nyeste updated_at
+        if bet['updated_at'] > existing['updated_at']:
             seen[key] = bet
-            unique_bets.append(bet)
-        else:
-            # Hvis duplikat, behold den med nyeste updated_at
-            existing = seen[key]
-            if bet['updated_at'] > existing['updated_at']:
-                # Bytt ut med nyere versjon
-                unique_bets.remove(existing)
-                unique_bets.append(bet)
-                seen[key] = bet
-            duplicates_removed += 1
-            print(f"Duplikat fjernet: {bet['event_id']} - {bet['selection']} på {bet['date']}")
+        print(f"Duplikat fjernet: {bet['event_id']} - {bet['selection']} på {bet['date']}")
     
+    unique_bets = list(seen.values())
+    duplicates_removed = len(bets) - len(unique_bets)
     return unique_bets, duplicates_removed
 
 def write_bets(bets):
@@ -67,6 +70,9 @@ if __name__ == "__main__":
     bets = read_bets()
     print(f"Totalt {len(bets)} bets lest")
     
+    migrated = migrate_event_ids(bets)
+    print(f"{migrated} event_id-er normalisert")
+    
     print("\nFjerner duplikater...")
     unique_bets, removed = remove_duplicates(bets)
     print(f"\n{removed} duplikater fjernet")
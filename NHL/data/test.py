@@ -1,36 +1,36 @@
-import csv
+import pandas as pd
 
-with open("bet_history.csv", "r") as f:
-    reader = csv.DictReader(f)
-    
-    bets = list(reader)
+# Alle felter som tekst slik at value-bøttene ([:3]) blir like strengene i CSV-en
+bets = pd.read_csv("bet_history.csv", dtype=str, keep_default_na=False)
+value = bets["value"].astype(float)
+odds = bets["odds"].astype(float)
+model_prob = bets["model_prob"].astype(float)
+profit = bets["profit"].astype(float)
 
-    ant = 0
-    value_to_bet = {}
-    model_probs_over_05 = 0
-    odds_over_3 = 0
-    for bet in bets:
-        if abs(float(bet["value"]) - (float(bet["odds"]) * float(bet["model_prob"]) - 1)) > 0.1:
-            print(bet)
-            ant += 1
-        if float(bet["model_prob"]) > 0.5:
-            model_probs_over_05 += 1
-            print(bet["date"])
-        if float(bet["odds"]) > 3:
-            odds_over_3 += 1
-    for bet in bets:
-        if float(bet["value"]) < 0.2 or float(bet["odds"]) > 4:
-            continue
-        if bet["value"][:3] not in value_to_bet:
-            value_to_bet[bet["value"][:3]] = float(bet["profit"])
-        else:
-            value_to_bet[bet["value"][:3]] += float(bet["profit"])
+mismatch = (value - (odds * model_prob - 1)).abs() > 0.1
+for bet in bets[mismatch].to_dict("records"):
+    print(bet)
 
-    print(f"Number of bets with value > 0.1: {ant}")
-    print(f"Number of bets with model_prob > 0.5: {model_probs_over_05}")
-    print(f"Number of bets with odds > 3: {odds_over_3}")
-    value_to_bet = dict(sorted(value_to_bet.items(), reverse=True))
-    total_profit = 0
-    for value, profit in value_to_bet.items():
-        total_profit += profit
-        print(f"Value: {value}, Total Profit: {total_profit}, Profit at this value: {profit}")
\ No newline at end of file
+high_prob = model_prob > 0.5
+for date in bets.loc[high_prob, "date"]:
+    print(date)
+
+ant = int(mismatch.sum())
+model_probs_over_05 = int(high_prob.sum())
+odds_over_3 = int((odds > 3).sum())
+
+selected = (value >= 0.2) & (odds <= 4)
+value_to_bet = (
+    profit[selected]
+    .groupby(bets.loc[selected, "value"].str[:3])
+    .sum()
+    .sort_index(ascending=False)
+)
+
+print(f"Number of bets with value > 0.1: {ant}")
+print(f"Number of bets with model_prob > 0.5: {model_probs_over_05}")
+print(f"Number of bets with odds > 3: {odds_over_3}")
+for value_bucket, total_profit, profit_at_value in zip(
+    value_to_bet.index, value_to_bet.cumsum(), value_to_bet
+):
+    print(f"Value: {value_bucket}, Total Profit: {total_profit}, Profit at this value: {profit_at_value}")
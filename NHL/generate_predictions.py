@@ -12,23 +12,28 @@ Uses live Norsk Tipping odds via the same value-report logic as the API/bet trac
 """
 from __future__ import annotations
 
+import hashlib
+import io
+import json
 import os
-from datetime import datetime, timezone
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 # Ensure matplotlib can cache fonts in environments without a writable home.
 MPL_CACHE_DIR = Path(os.environ.setdefault("MPLCONFIGDIR", str(Path("/tmp/mplcache"))))
 MPL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-import matplotlib
-
-# Use a headless backend for CI.
-matplotlib.use("Agg")
-
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+from utils.pickle_cache import read_pickle_cache, write_pickle_cache
+from utils.value_utils import OUTCOME_KEYS, SELECTION_FIELDS
+
 try:
     from bet_tracker import _build_value_report
 except Exception as exc:  # pragma: no cover - guardrail for CI
@@ -51,6 +56,10 @@ VALUE_MAX_ODDS = float(_MAX_ODDS_RAW) if _MAX_ODDS_RAW else 4.0
 VALUE_DAYS_AHEAD = int(os.environ.get("NHL_VALUE_DAYS_AHEAD", "0"))
 VALUE_FALLBACK_DAYS = int(os.environ.get("NHL_VALUE_FALLBACK_DAYS", "3"))
 VALUE_CHART_MAX = int(os.environ.get("NHL_VALUE_CHART_MAX", "12"))
+# Reruns within this window reuse the previous odds/model fetch from disk (0 disables).
+VALUE_REPORT_CACHE_TTL = int(os.environ.get("NHL_VALUE_REPORT_CACHE_TTL", "600"))
+# Input hash + file stat per rendered chart; unchanged charts are not re-rendered.
+CHART_STATE_PATH = MPL_CACHE_DIR / "chart_state.json"
 
 TABLE_COLUMNS = [
     "Date",
@@ -62,29 +71,78 @@ TABLE_COLUMNS = [
     "Expected Value",
 ]
 
+# zlib level 1 instead of the default 6: PNG encoding is most of the chart time,
+# and the files only grow by roughly a quarter.
+PNG_PIL_KWARGS = {"compress_level": 1}
+
+# Column order used when picking the selected outcome's odds/probabilities.
+SELECTION_KEYS = OUTCOME_KEYS
+SELECTION_INDEX = {key: i for i, key in enumerate(SELECTION_KEYS)}
+# Report columns per pick (odds, model, implied, value), each in SELECTION_KEYS order.
+ODDS_COLUMNS, MODEL_COLUMNS, IMPLIED_COLUMNS, VALUE_COLUMNS = zip(
+    *(SELECTION_FIELDS[key] for key in SELECTION_KEYS)
+)
+
+
+_plt = None
+_STYLE_APPLIED = False
+# One reusable Figure per figsize; cleared between charts and closed at the end of main().
+_FIGURES: Dict[Tuple[float, float], Any] = {}
+
+
+def _lazy_plt():
+    """Import matplotlib on first use, so runs that render nothing skip its startup cost."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+
+        # Use a headless backend for CI.
+        matplotlib.use("Agg")
+
+        import matplotlib.pyplot as plt
+
+        _plt = plt
+    return _plt
+
 
 def _use_plot_style() -> None:
     """Apply preferred style with graceful fallback for older Matplotlib versions."""
+    global _STYLE_APPLIED
+    if _STYLE_APPLIED:
+        return
+    plt = _lazy_plt()
     try:
         plt.style.use("seaborn-v0_8-darkgrid")
     except OSError:
         plt.style.use("seaborn-darkgrid")
+    _STYLE_APPLIED = True
 
 
-def _parse_iso(dt: Optional[str]) -> Optional[datetime]:
-    if not dt:
-        return None
-    try:
-        return datetime.fromisoformat(str(dt).replace("Z", "+00:00"))
-    except Exception:
-        return None
+def _get_axes(figsize: Tuple[float, float]):
+    """Empty (fig, ax) of the given size, reusing the Figure from a previous chart."""
+    _use_plot_style()
+    fig = _FIGURES.get(figsize)
+    if fig is None:
+        fig = _FIGURES[figsize] = _lazy_plt().figure(figsize=figsize)
+    else:
+        fig.clear()
+    return fig, fig.add_subplot(111)
+
+
+def _close_figures() -> None:
+    for fig in _FIGURES.values():
+        _plt.close(fig)
+    _FIGURES.clear()
 
 
-def _to_float(value: Any) -> Optional[float]:
-    if value is None:
+def _parse_iso(dt: Optional[str]) -> Optional[datetime]:
+    if not dt:
         return None
+    text = dt if isinstance(dt, str) else str(dt)
+    if text.endswith("Z"):  # only rewrite the UTC suffix, no full-string replace
+        text = text[:-1] + "+00:00"
     try:
-        return float(value)
+        return datetime.fromisoformat(text)
     except Exception:
         return None
 
@@ -95,13 +153,28 @@ def _team_label(game: Dict[str, Any], side: str) -> str:
     return abbr or name
 
 
+@lru_cache(maxsize=1024)
+def _matchup_for(home_abbr: Any, home: Any, away_abbr: Any, away: Any, event_id: Any) -> str:
+    # Interned: the same matchup shows up for several days and selections.
+    home_label = str(home_abbr or "").strip() or str(home or "").strip()
+    away_label = str(away_abbr or "").strip() or str(away or "").strip()
+    if home_label and away_label:
+        return sys.intern(f"{home_label} vs {away_label}")
+    return sys.intern(str(event_id or "Unknown matchup"))
+
+
 def _matchup_label(game: Dict[str, Any]) -> str:
-    home = _team_label(game, "home")
-    away = _team_label(game, "away")
-    if home and away:
-        return f"{home} vs {away}"
-    event_id = game.get("event_id") or game.get("eventId")
-    return str(event_id or "Unknown matchup")
+    key = (
+        game.get("home_abbr"),
+        game.get("home"),
+        game.get("away_abbr"),
+        game.get("away"),
+        game.get("event_id") or game.get("eventId"),
+    )
+    try:
+        return _matchup_for(*key)
+    except TypeError:  # unhashable field values
+        return _matchup_for.__wrapped__(*key)
 
 
 def _selection_label(selection: str, game: Dict[str, Any]) -> str:
@@ -125,8 +198,20 @@ def _game_date(game: Dict[str, Any]) -> str:
     return ""
 
 
-def _report_date_range(report: Sequence[Dict[str, Any]]) -> str:
-    dates = sorted({d for d in (_game_date(g) for g in report) if d})
+def _game_dates(report: Sequence[Dict[str, Any]]) -> List[str]:
+    """_game_date for a whole report; only rows without a date field parse their start time."""
+    dates = pd.Series([g.get("date") or "" for g in report], dtype=object).astype(str).str.strip()
+    missing = np.flatnonzero((dates == "").to_numpy())
+    result = dates.tolist()
+    for i in missing:
+        result[i] = _game_date(report[i])
+    return result
+
+
+def _report_date_range(report: Sequence[Dict[str, Any]], dates: Optional[Sequence[str]] = None) -> str:
+    if dates is None:
+        dates = _game_dates(report)
+    dates = sorted({d for d in dates if d})
     if not dates:
         return "Unknown date"
     if len(dates) == 1:
@@ -134,93 +219,213 @@ def _report_date_range(report: Sequence[Dict[str, Any]]) -> str:
     return f"{dates[0]} to {dates[-1]}"
 
 
+def _report_cache_path(days_ahead: int) -> Path:
+    # The UTC date is part of the key since the report window starts "today".
+    today = datetime.utcnow().date()
+    return MPL_CACHE_DIR / f"value_report_{days_ahead}_{today:%Y%m%d}.pkl"
+
+
+def _read_report_cache(path: Path) -> Optional[List[Dict[str, Any]]]:
+    if VALUE_REPORT_CACHE_TTL <= 0:
+        return None
+    try:
+        if time.time() - path.stat().st_mtime > VALUE_REPORT_CACHE_TTL:
+            return None
+    except OSError:
+        return None
+    return read_pickle_cache(path)
+
+
+def _write_report_cache(path: Path, report: List[Dict[str, Any]]) -> None:
+    if VALUE_REPORT_CACHE_TTL <= 0:
+        return
+    write_pickle_cache(path, report, "value report cache")
+
+
+@lru_cache(maxsize=4)
+def _cached_value_report(days_ahead: int) -> Tuple[Dict[str, Any], ...]:
+    """Builds the report at most once per process and horizon; failures are not cached."""
+    cache_path = _report_cache_path(days_ahead)
+    report = _read_report_cache(cache_path)
+    if report is None:
+        report = _build_value_report(days_ahead)
+        if report:
+            _write_report_cache(cache_path, report)
+    return tuple(report)
+
+
 def load_value_report(days_ahead: int) -> List[Dict[str, Any]]:
     if _build_value_report is None:
         print(f"[value-report] Missing bet_tracker import: {_IMPORT_ERROR}")
         return []
     try:
-        return _build_value_report(days_ahead)
+        return list(_cached_value_report(days_ahead))
     except Exception as exc:
         print(f"[value-report] Failed to build report: {exc}")
         return []
 
 
+def _within_days_ahead(
+    report: Sequence[Dict[str, Any]], dates: Sequence[str], days_ahead: int
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Subset of a longer-horizon report (and its dates) matching _build_value_report(days_ahead)."""
+    last_date = (datetime.utcnow().date() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+    keep = [i for i, d in enumerate(dates) if d <= last_date]
+    return [report[i] for i in keep], [dates[i] for i in keep]
+
+
+def _numeric_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in df:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+
+
+def _pick_by_selection(df: pd.DataFrame, columns: Sequence[str], choice: np.ndarray) -> np.ndarray:
+    """Value of the selected outcome's column per row (columns in SELECTION_KEYS order)."""
+    stacked = np.column_stack([_numeric_column(df, c) for c in columns])
+    picked = stacked[np.arange(len(df)), np.maximum(choice, 0)]
+    return np.where(choice >= 0, picked, np.nan)
+
+
+def _round_or_none(values: np.ndarray, decimals: int) -> List[Optional[float]]:
+    # Python round() on the few surviving rows keeps the table identical to the previous output.
+    return [None if v != v else round(v, decimals) for v in values.tolist()]
+
+
 def build_value_table(
     report: Sequence[Dict[str, Any]],
     min_value: float,
     max_odds: Optional[float],
+    dates: Optional[Sequence[str]] = None,
 ) -> pd.DataFrame:
-    rows: List[Dict[str, Any]] = []
-
-    for game in report:
-        delta = _to_float(game.get("best_value_delta"))
-        if delta is None or delta <= min_value:
-            continue
-
-        selection = game.get("best_value") or game.get("selection")
-        if not selection:
-            continue
-        selection_key = str(selection).lower()
-
-        odds_lookup = {
-            "home": game.get("odds_home"),
-            "draw": game.get("odds_draw"),
-            "away": game.get("odds_away"),
-        }
-        model_lookup = {
-            "home": game.get("model_home_win"),
-            "draw": game.get("model_draw"),
-            "away": game.get("model_away_win"),
-        }
-        implied_lookup = {
-            "home": game.get("implied_home_prob"),
-            "draw": game.get("implied_draw_prob"),
-            "away": game.get("implied_away_prob"),
-        }
-        value_lookup = {
-            "home": game.get("value_home"),
-            "draw": game.get("value_draw"),
-            "away": game.get("value_away"),
-        }
+    """`dates` (from _game_dates) can be passed in so the report's dates are only derived once."""
+    if not report:
+        return pd.DataFrame(columns=TABLE_COLUMNS)
 
-        odds = _to_float(odds_lookup.get(selection_key))
-        if odds is None:
-            continue
-        if max_odds is not None and odds >= max_odds:
-            continue
-
-        model_prob = _to_float(model_lookup.get(selection_key))
-        implied_prob = _to_float(implied_lookup.get(selection_key))
-        value = _to_float(value_lookup.get(selection_key))
-        ev_value = value if value is not None else delta
-
-        rows.append(
-            {
-                "Date": _game_date(game),
-                "Matchup": _matchup_label(game),
-                "Selection": _selection_label(selection_key, game),
-                "Model Probability": round(model_prob, 3) if model_prob is not None else None,
-                "Market Odds": round(odds, 2),
-                "Implied Prob": round(implied_prob, 3) if implied_prob is not None else None,
-                "Expected Value": round(ev_value, 3) if ev_value is not None else None,
-            }
-        )
+    df = pd.DataFrame.from_records(list(report))
+
+    # best_value, falling back to selection, as an index into SELECTION_KEYS (-1 if unknown)
+    choice = np.array(
+        [
+            SELECTION_INDEX.get(str(sel).lower(), -1) if sel else -1
+            for sel in (g.get("best_value") or g.get("selection") for g in report)
+        ],
+        dtype=int,
+    )
+
+    delta = _numeric_column(df, "best_value_delta")
+    odds = _pick_by_selection(df, ODDS_COLUMNS, choice)
 
-    if not rows:
+    keep = (delta > min_value) & (choice >= 0) & ~np.isnan(odds)
+    if max_odds is not None:
+        keep &= odds < max_odds
+    rows_idx = np.flatnonzero(keep)
+    if not len(rows_idx):
         return pd.DataFrame(columns=TABLE_COLUMNS)
 
-    table = pd.DataFrame(rows)
-    table = table.dropna(subset=["Expected Value"])
-    table.sort_values(by="Expected Value", ascending=False, inplace=True)
-    table.reset_index(drop=True, inplace=True)
+    model_prob = _pick_by_selection(df, MODEL_COLUMNS, choice)
+    implied_prob = _pick_by_selection(df, IMPLIED_COLUMNS, choice)
+    value = _pick_by_selection(df, VALUE_COLUMNS, choice)
+    ev_value = np.where(np.isnan(value), delta, value)
+
+    # Sort the surviving rows on the rounded EV up front instead of sorting and re-indexing
+    # the finished DataFrame. Highest EV first; rows with equal rounded EV stay in report
+    # order, so the table is deterministic whatever the NumPy version.
+    ev_rounded = np.array(_round_or_none(ev_value[rows_idx], 3), dtype=np.float64)
+    rows_idx = rows_idx[np.argsort(-ev_rounded, kind="stable")]
+
+    if dates is None:
+        dates = _game_dates(report)
+    games = [report[i] for i in rows_idx]
+    keys = [SELECTION_KEYS[c] for c in choice[rows_idx]]
+    table = pd.DataFrame(
+        {
+            "Date": [dates[i] for i in rows_idx],
+            "Matchup": [_matchup_label(g) for g in games],
+            "Selection": [_selection_label(k, g) for k, g in zip(keys, games)],
+            "Model Probability": _round_or_none(model_prob[rows_idx], 3),
+            "Market Odds": _round_or_none(odds[rows_idx], 2),
+            "Implied Prob": _round_or_none(implied_prob[rows_idx], 3),
+            "Expected Value": _round_or_none(ev_value[rows_idx], 3),
+        }
+    )
     return table
 
 
+_READY_DIRS: set = set()
+
+
+def _ensure_dir(directory: Path) -> None:
+    """mkdir each output directory once per run instead of before every write."""
+    if directory not in _READY_DIRS:
+        directory.mkdir(parents=True, exist_ok=True)
+        _READY_DIRS.add(directory)
+
+
+def _atomic_write(path: Path, write: Callable[[Any], None]) -> None:
+    """Write via a unique temp file in the target directory, then os.replace it into place."""
+    _ensure_dir(path.parent)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.stem}_", suffix=path.suffix, delete=False
+    ) as tmp:
+        try:
+            write(tmp)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.chmod(tmp.name, 0o644)  # NamedTemporaryFile creates 0600 files
+    os.replace(tmp.name, path)
+
+
 def atomic_write_text(path: Path, content: str) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = path.with_suffix(path.suffix + ".tmp")
-    tmp_path.write_text(content, encoding="utf-8")
-    tmp_path.replace(path)
+    _atomic_write(path, lambda f: f.write(content.encode("utf-8")))
+
+
+def _atomic_savefig(fig, output_path: Path) -> None:
+    # Encode in memory first: one write to the temp file, and nothing on disk if rendering fails.
+    buffer = io.BytesIO()
+    fig.savefig(buffer, dpi=150, bbox_inches="tight", format="png", pil_kwargs=PNG_PIL_KWARGS)
+    _atomic_write(output_path, lambda f: f.write(buffer.getbuffer()))
+
+
+def _markdown_table(table: pd.DataFrame, floatfmt: str = ".3f") -> str:
+    """
+    GitHub pipe table laid out like tabulate's "github" format (what to_markdown produced):
+    text columns left-aligned, numeric columns formatted with `floatfmt` and decimal-aligned.
+    """
+    columns: List[Tuple[str, List[str], bool]] = []
+    for name in table.columns:
+        series = table[name]
+        numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        if numeric:
+            cells = [format(v, floatfmt) for v in series.tolist()]
+            # Decimal alignment: pad cells with fewer digits after the point (e.g. "nan") on the right.
+            after = [len(c) - c.index(".") if "." in c else 0 for c in cells]
+            cells = [c + " " * (max(after) - a) for c, a in zip(cells, after)]
+        else:
+            # tabulate strips surrounding whitespace from text cells
+            cells = ["" if v is None or v != v else str(v).strip() for v in series.tolist()]
+        columns.append((str(name), cells, numeric))
+
+    widths = [max([len(name) + 2] + [len(c) for c in cells]) for name, cells, _ in columns]
+
+    def _line(values: Sequence[str]) -> str:
+        return "| " + " | ".join(values) + " |"
+
+    lines = [
+        _line([
+            name.rjust(w) if numeric else name.ljust(w)
+            for (name, _, numeric), w in zip(columns, widths)
+        ]),
+        "|" + "|".join("-" * (w + 2) for w in widths) + "|",
+    ]
+    for row in zip(*(cells for _, cells, _ in columns)):
+        lines.append(_line([
+            cell.rjust(w) if numeric else cell.ljust(w)
+            for cell, (_, _, numeric), w in zip(row, columns, widths)
+        ]))
+    return "\n".join(lines)
 
 
 def save_markdown(
@@ -260,18 +465,12 @@ def save_markdown(
         atomic_write_text(output_path, content)
         return
 
-    try:
-        md_table = table.to_markdown(index=False, tablefmt="github", floatfmt=".3f")
-    except Exception:
-        md_table = table.to_string(index=False)
-
-    content = "\n".join(header + [md_table, ""])
+    content = "\n".join(header + [_markdown_table(table), ""])
     atomic_write_text(output_path, content)
 
 
 def save_chart(table: pd.DataFrame, output_path: Path, max_rows: int = VALUE_CHART_MAX) -> None:
-    _use_plot_style()
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig, ax = _get_axes((10, 5))
 
     if table.empty:
         ax.axis("off")
@@ -285,42 +484,70 @@ def save_chart(table: pd.DataFrame, output_path: Path, max_rows: int = VALUE_CHA
             color="#e5e7eb",
         )
         fig.tight_layout()
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        tmp_path = output_path.with_name(output_path.stem + "_tmp" + output_path.suffix)
-        fig.savefig(tmp_path, dpi=150, bbox_inches="tight", format="png")
-        tmp_path.replace(output_path)
-        plt.close(fig)
+        _atomic_savefig(fig, output_path)
         return
 
-    chart_table = table.head(max_rows).copy()
-    bars = ax.bar(
+    chart_table = table.head(max_rows)
+    ev = chart_table["Expected Value"]
+    _save_bar_chart(
+        fig,
+        ax,
         chart_table["Matchup"],
-        chart_table["Expected Value"],
-        color="#16a34a",
+        ev,
+        "#16a34a",
+        title="Latest positive EV bets",
+        ylabel="Expected Value (unit stake)",
+        output_path=output_path,
+        value_fmt="{:.2f}",
+        label_offset=0.01,
+        xlabel="Matchup",
+        ylim=(0, max(0.4, ev.max() + 0.05)),
+        tick_rotation=25,
+        tick_ha="right",
     )
-    ax.axhline(0, color="#555", linewidth=1)
-    ax.set_ylabel("Expected Value (unit stake)")
-    ax.set_xlabel("Matchup")
-    ax.set_title("Latest positive EV bets")
-    ax.set_ylim(0, max(0.4, chart_table["Expected Value"].max() + 0.05))
-    plt.xticks(rotation=25, ha="right")
 
-    for bar, ev in zip(bars, chart_table["Expected Value"]):
+
+def _save_bar_chart(
+    fig,
+    ax,
+    labels,
+    values,
+    colors,
+    *,
+    title: str,
+    ylabel: str,
+    output_path: Path,
+    value_fmt: str,
+    label_offset: float,
+    width: float = 0.8,
+    xlabel: Optional[str] = None,
+    ylim: Optional[Tuple[float, float]] = None,
+    tick_rotation: float = 0,
+    tick_ha: str = "center",
+) -> None:
+    """Bar chart with a zero line and each value printed above (or below, if negative) its bar."""
+    bars = ax.bar(labels, values, color=colors, width=width)
+    ax.axhline(0, color="#555", linewidth=1)
+    ax.set_ylabel(ylabel)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    ax.set_title(title)
+    if ylim is not None:
+        ax.set_ylim(*ylim)
+    _lazy_plt().setp(ax.get_xticklabels(), rotation=tick_rotation, ha=tick_ha)
+
+    for bar, value in zip(bars, values):
         ax.text(
             bar.get_x() + bar.get_width() / 2,
-            ev + 0.01,
-            f"{ev:.2f}",
+            value + (label_offset if value >= 0 else -label_offset),
+            value_fmt.format(value),
             ha="center",
-            va="bottom",
+            va="bottom" if value >= 0 else "top",
             fontsize=9,
         )
 
     fig.tight_layout()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = output_path.with_name(output_path.stem + "_tmp" + output_path.suffix)
-    fig.savefig(tmp_path, dpi=150, bbox_inches="tight", format="png")
-    tmp_path.replace(output_path)
-    plt.close(fig)
+    _atomic_savefig(fig, output_path)
 
 
 def build_portfolio_timeseries(path: Path) -> Optional[pd.DataFrame]:
@@ -329,7 +556,13 @@ def build_portfolio_timeseries(path: Path) -> Optional[pd.DataFrame]:
         print(f"[portfolio] No bet history found at {path}")
         return None
 
-    df = pd.read_csv(path)
+    # Only the three columns the chart needs are parsed; the rest of the history is skipped.
+    required = ("date", "profit", "stake")
+    df = pd.read_csv(
+        path,
+        usecols=lambda column: column in required,
+        dtype={"date": str, "profit": "float64", "stake": "float64"},
+    )
     if "date" not in df or "profit" not in df or "stake" not in df:
         print("[portfolio] bet_history.csv is missing required columns (date, profit, stake)")
         return None
@@ -338,8 +571,10 @@ def build_portfolio_timeseries(path: Path) -> Optional[pd.DataFrame]:
     df = df.dropna(subset=["date"])
     df.sort_values("date", inplace=True)
 
+    # Daily datetime bins on the sorted column; the grouper also emits days without bets,
+    # which are dropped again so the series only has days that were bet on.
     daily = (
-        df.groupby(df["date"].dt.date)
+        df.groupby(pd.Grouper(key="date", freq="D"))
         .agg(
             DailyProfit=("profit", "sum"),
             BetCount=("profit", "size"),
@@ -347,23 +582,25 @@ def build_portfolio_timeseries(path: Path) -> Optional[pd.DataFrame]:
         .reset_index()
         .rename(columns={"date": "Date"})
     )
+    daily = daily[daily["BetCount"] > 0].reset_index(drop=True)
 
     # Drop the most recent day to avoid incomplete in-progress results.
     if len(daily) > 1:
         daily = daily.iloc[:-1]
 
-    daily["Cumulative Profit"] = daily["DailyProfit"].cumsum()
+    # Both chart series are computed once on the raw arrays; bets * 100 mirrors the stake line style.
+    daily["Cumulative Profit"] = np.cumsum(daily["DailyProfit"].to_numpy())
+    daily["BetVolume"] = daily["BetCount"].to_numpy() * 100
     return daily
 
 
 def save_portfolio_chart(daily: pd.DataFrame, output_path: Path) -> None:
-    _use_plot_style()
-    fig, ax = plt.subplots(figsize=(10, 5))
+    fig, ax = _get_axes((10, 5))
 
-    dates = pd.to_datetime(daily["Date"])
+    dates = daily["Date"]  # already datetime64 from build_portfolio_timeseries
     x = list(range(len(dates)))
-    value = daily["Cumulative Profit"]
-    bet_volume = daily["BetCount"] * 100  # bets * 100 to mirror stake line style
+    value = daily["Cumulative Profit"].to_numpy()
+    bet_volume = daily["BetVolume"].to_numpy()
 
     ax.plot(x, value, color="#34d399", linewidth=2.8, label="Netto resultat")
     ax.plot(
@@ -377,18 +614,14 @@ def save_portfolio_chart(daily: pd.DataFrame, output_path: Path) -> None:
 
     xtick_step = max(1, len(x) // 8)
     ax.set_xticks(x[::xtick_step])
-    ax.set_xticklabels([d.strftime("%b %d") for d in dates[::xtick_step]], rotation=25, ha="right")
+    ax.set_xticklabels(dates.iloc[::xtick_step].dt.strftime("%b %d").tolist(), rotation=25, ha="right")
     ax.set_ylabel("Belop (kr) / Bets x100")
     ax.set_title("Portefolje over tid")
     ax.grid(True, linestyle="--", alpha=0.35)
     ax.legend()
     fig.tight_layout()
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = output_path.with_name(output_path.stem + "_tmp" + output_path.suffix)
-    fig.savefig(tmp_path, dpi=150, bbox_inches="tight", format="png")
-    tmp_path.replace(output_path)
-    plt.close(fig)
+    _atomic_savefig(fig, output_path)
 
 
 def save_recent_profit_chart(
@@ -404,53 +637,104 @@ def save_recent_profit_chart(
         print("[recent-profit] Ingen data a plotte")
         return
 
-    trimmed = daily.tail(days).copy()
-    trimmed["Date"] = pd.to_datetime(trimmed["Date"])
+    trimmed = daily.tail(days)
 
-    _use_plot_style()
-    fig, ax = plt.subplots(figsize=(8.5, 4.5))
+    fig, ax = _get_axes((8.5, 4.5))
 
     profits = trimmed["DailyProfit"]
-    labels = [d.strftime("%b %d") for d in trimmed["Date"]]
-    colors = ["#16a34a" if p > 0 else ("#dc2626" if p < 0 else "#6b7280") for p in profits]
+    labels = trimmed["Date"].dt.strftime("%b %d").tolist()
+    profit_values = profits.to_numpy()
+    colors = np.select(
+        [profit_values > 0, profit_values < 0], ["#16a34a", "#dc2626"], default="#6b7280"
+    ).tolist()
+
+    _save_bar_chart(
+        fig,
+        ax,
+        labels,
+        profits,
+        colors,
+        title=f"Daglig resultat - siste {min(days, len(trimmed))} dager",
+        ylabel="Daglig resultat (kr)",
+        output_path=output_path,
+        value_fmt="{:.0f}",
+        label_offset=5,
+        width=0.6,
+    )
 
-    bars = ax.bar(labels, profits, color=colors, width=0.6)
-    ax.axhline(0, color="#555", linewidth=1)
-    ax.set_ylabel("Daglig resultat (kr)")
-    ax.set_title(f"Daglig resultat - siste {min(days, len(trimmed))} dager")
-    plt.xticks(rotation=0)
 
-    for bar, value in zip(bars, profits):
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            value + (5 if value >= 0 else -5),
-            f"{value:.0f}",
-            ha="center",
-            va="bottom" if value >= 0 else "top",
-            fontsize=9,
-        )
+@lru_cache(maxsize=1)
+def _script_digest() -> bytes:
+    # Hash of the source, not its mtime: a fresh CI checkout gives new mtimes for unchanged code.
+    return hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).digest()
 
-    fig.tight_layout()
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = output_path.with_name(output_path.stem + "_tmp" + output_path.suffix)
-    fig.savefig(tmp_path, dpi=150, bbox_inches="tight", format="png")
-    tmp_path.replace(output_path)
-    plt.close(fig)
+
+def _chart_key(*parts: Any) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    # Editing this script (colours, layout, ...) must also invalidate the charts.
+    digest.update(_script_digest())
+    for part in parts:
+        data = part.to_csv(index=False) if isinstance(part, pd.DataFrame) else repr(part)
+        digest.update(data.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _load_chart_state() -> Dict[str, Any]:
+    try:
+        return json.loads(CHART_STATE_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def _file_stamp(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _render_if_changed(state: Dict[str, Any], path: Path, key: str, render: Callable[[], None]) -> bool:
+    """
+    Renders the chart unless `path` is exactly the file we produced last time from the same inputs.
+    Returns True if the chart was rendered.
+    """
+    entry = state.get(str(path))
+    stamp = _file_stamp(path)
+    if entry is not None and stamp is not None and entry == {"key": key, "stamp": stamp}:
+        print(f"[charts] Inputs unchanged, kept {path.name}")
+        return False
+    render()
+    state[str(path)] = {"key": key, "stamp": _file_stamp(path)}
+    return True
+
+
+def _save_chart_state(state: Dict[str, Any]) -> None:
+    try:
+        atomic_write_text(CHART_STATE_PATH, json.dumps(state, indent=1, sort_keys=True))
+    except Exception as exc:
+        print(f"[charts] Could not write chart state: {exc}")
 
 
 def main() -> None:
-    report = load_value_report(VALUE_DAYS_AHEAD)
+    # Fetch the longest horizon once and derive the primary window locally,
+    # so an empty primary window does not cost a second odds/model round-trip.
+    horizon = max(VALUE_DAYS_AHEAD, VALUE_FALLBACK_DAYS)
+    full_report = load_value_report(horizon)
+    full_dates = _game_dates(full_report)
+    report, dates = _within_days_ahead(full_report, full_dates, VALUE_DAYS_AHEAD)
     used_days = VALUE_DAYS_AHEAD
     fallback_used = False
 
     if not report and VALUE_FALLBACK_DAYS > VALUE_DAYS_AHEAD:
-        report = load_value_report(VALUE_FALLBACK_DAYS)
+        report, dates = full_report, full_dates
         used_days = VALUE_FALLBACK_DAYS
         fallback_used = True
 
-    table = build_value_table(report, VALUE_MIN, VALUE_MAX_ODDS)
+    table = build_value_table(report, VALUE_MIN, VALUE_MAX_ODDS, dates=dates)
     report_meta = {
-        "date_range": _report_date_range(report),
+        "date_range": _report_date_range(report, dates=dates),
         "days_ahead": used_days,
         "min_value": VALUE_MIN,
         "max_odds": VALUE_MAX_ODDS,
@@ -460,19 +744,39 @@ def main() -> None:
     }
 
     save_markdown(table, OUTPUT_MARKDOWN, report_meta)
-    save_chart(table, OUTPUT_IMAGE, max_rows=VALUE_CHART_MAX)
+
+    chart_state = _load_chart_state()
+    value_chart_rendered = _render_if_changed(
+        chart_state,
+        OUTPUT_IMAGE,
+        _chart_key("value", table, VALUE_CHART_MAX),
+        lambda: save_chart(table, OUTPUT_IMAGE, max_rows=VALUE_CHART_MAX),
+    )
 
     portfolio_daily = build_portfolio_timeseries(BET_HISTORY_PATH)
     if portfolio_daily is not None and not portfolio_daily.empty:
-        save_portfolio_chart(portfolio_daily, PORTFOLIO_IMAGE)
-        save_recent_profit_chart(portfolio_daily, DAILY_PROFIT_IMAGE, days=5)
-        print(f"Wrote {PORTFOLIO_IMAGE.relative_to(REPO_ROOT)}")
-        print(f"Wrote {DAILY_PROFIT_IMAGE.relative_to(REPO_ROOT)}")
+        if _render_if_changed(
+            chart_state,
+            PORTFOLIO_IMAGE,
+            _chart_key("portfolio", portfolio_daily),
+            lambda: save_portfolio_chart(portfolio_daily, PORTFOLIO_IMAGE),
+        ):
+            print(f"Wrote {PORTFOLIO_IMAGE.relative_to(REPO_ROOT)}")
+        if _render_if_changed(
+            chart_state,
+            DAILY_PROFIT_IMAGE,
+            _chart_key("recent", portfolio_daily.tail(5)),
+            lambda: save_recent_profit_chart(portfolio_daily, DAILY_PROFIT_IMAGE, days=5),
+        ):
+            print(f"Wrote {DAILY_PROFIT_IMAGE.relative_to(REPO_ROOT)}")
     else:
         print("[portfolio] Skipped portfolio graph (no data).")
+    _close_figures()
+    _save_chart_state(chart_state)
 
     print(f"Wrote {OUTPUT_MARKDOWN.relative_to(REPO_ROOT)}")
-    print(f"Wrote {OUTPUT_IMAGE.relative_to(REPO_ROOT)}")
+    if value_chart_rendered:
+        print(f"Wrote {OUTPUT_IMAGE.relative_to(REPO_ROOT)}")
 
 
 if __name__ == "__main__":
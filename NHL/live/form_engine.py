@@ -1,12 +1,24 @@
 # live/form_engine.py
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from typing import Dict, List, Sequence
 
+import numpy as np
+
 from live.nhl_api import get_team_recent_games
 from utils.feature_engineering import DEFAULT_WINDOWS
 
 
 def _parse_date(date_str: str):
+    if not isinstance(date_str, str):
+        return None
+    return _parse_date_str(date_str)
+
+
+@lru_cache(maxsize=8192)
+def _parse_date_str(date_str: str):
+    # Samme datoer går igjen for alle lag i en kjøring; datetime er immutabel og kan deles
     try:
         return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
     except Exception:
@@ -15,21 +27,24 @@ def _parse_date(date_str: str):
 
 def _sort_games_desc(games: List[Dict]) -> List[Dict]:
     """Sorter kamper etter dato (nyeste først)."""
-    # Dedup med samme nøkkel som i nhl_api for ekstra sikkerhet
-    seen = set()
-    unique = []
+    # Dedup med samme nøkkel som i nhl_api for ekstra sikkerhet (første forekomst beholdes)
+    unique: Dict[object, Dict] = {}
     for g in games:
-        key = g.get("id") or f"{g.get('home')}|{g.get('away')}|{g.get('date')}"
-        if key in seen:
-            continue
-        seen.add(key)
-        unique.append(g)
+        unique.setdefault(g.get("id") or f"{g.get('home')}|{g.get('away')}|{g.get('date')}", g)
+
+    # Datoen parses én gang per kamp; stabil sortering på nøkkelen alene
+    decorated = [(_parse_date(g.get("date")) or g.get("date"), g) for g in unique.values()]
+    decorated.sort(key=itemgetter(0), reverse=True)
+    return [g for _, g in decorated]
 
-    return sorted(
-        unique,
-        key=lambda g: _parse_date(g.get("date")) or g.get("date"),
-        reverse=True,
-    )
+
+def _extract_gf_ga(team_abbr: str, games: List[Dict]):
+    """Mål for og mot (float64-arrays) sett fra `team_abbr` for hver kamp."""
+    n = len(games)
+    is_home = np.fromiter((g["home"] == team_abbr for g in games), dtype=bool, count=n)
+    home_goals = np.fromiter((g["home_goals"] for g in games), dtype=np.float64, count=n)
+    away_goals = np.fromiter((g["away_goals"] for g in games), dtype=np.float64, count=n)
+    return np.where(is_home, home_goals, away_goals), np.where(is_home, away_goals, home_goals)
 
 
 def compute_team_form_from_games(
@@ -51,28 +66,23 @@ def compute_team_form_from_games(
             result[f"form_win_rate_w{w}"] = 0.5
         return result
 
+    # Mål for/mot og seire regnes én gang for de nyeste kampene; hvert vindu
+    # er da bare et oppslag i de kumulative summene.
+    gf, ga = _extract_gf_ga(team_abbr, games[: max(windows, default=0)])
+    n = len(gf)
+    gf_cs = gf.cumsum()
+    ga_cs = ga.cumsum()
+    wins_cs = (gf > ga).cumsum()
+
     for w in windows:
-        subset = games[:w]
-        if not subset:
+        size = min(w, n)
+        if size <= 0:
             continue
 
-        goals_for = []
-        goals_against = []
-        wins = []
-
-        for g in subset:
-            is_home = g["home"] == team_abbr
-            gf = g["home_goals"] if is_home else g["away_goals"]
-            ga = g["away_goals"] if is_home else g["home_goals"]
-
-            goals_for.append(gf)
-            goals_against.append(ga)
-            wins.append(1 if gf > ga else 0)
-
         # Behold full presisjon som i treningspipen (ingen nedrunding)
-        result[f"form_goals_for_w{w}"] = sum(goals_for) / len(subset)
-        result[f"form_goals_against_w{w}"] = sum(goals_against) / len(subset)
-        result[f"form_win_rate_w{w}"] = sum(wins) / len(subset)
+        result[f"form_goals_for_w{w}"] = float(gf_cs[size - 1] / size)
+        result[f"form_goals_against_w{w}"] = float(ga_cs[size - 1] / size)
+        result[f"form_win_rate_w{w}"] = float(wins_cs[size - 1] / size)
 
     return result
 
@@ -129,22 +139,15 @@ def compute_stats_from_games(team_abbr: str, games: List[Dict]) -> Dict[str, flo
             "win_percentage": 0.0,
         }
 
-    goals_for, goals_against, wins = [], [], []
-    for g in games:
-        is_home = g["home"] == team_abbr
-        gf = g["home_goals"] if is_home else g["away_goals"]
-        ga = g["away_goals"] if is_home else g["home_goals"]
-        goals_for.append(gf)
-        goals_against.append(ga)
-        wins.append(1 if gf > ga else 0)
-
-    losses = len(wins) - sum(wins)
-    win_pct = (sum(wins) / len(wins) * 100) if wins else 0.0
+    # Én passering over kampene; summene regnes på arrayene
+    gf, ga = _extract_gf_ga(team_abbr, games)
+    n = len(gf)
+    wins = int(np.count_nonzero(gf > ga))
 
     return {
-        "goals_for_avg": round(sum(goals_for) / len(goals_for), 2),
-        "goals_against_avg": round(sum(goals_against) / len(goals_against), 2),
-        "wins": int(sum(wins)),
-        "losses": int(losses),
-        "win_percentage": round(win_pct, 1),
+        "goals_for_avg": round(float(gf.sum()) / n, 2),
+        "goals_against_avg": round(float(ga.sum()) / n, 2),
+        "wins": wins,
+        "losses": n - wins,
+        "win_percentage": round(wins / n * 100, 1),
     }
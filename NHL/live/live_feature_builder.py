@@ -1,4 +1,8 @@
 # live/live_feature_builder.py
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional, Sequence
 
@@ -11,61 +15,121 @@ from utils.feature_engineering import DEFAULT_WINDOWS, get_feature_columns
 from utils.team_alias import to_canonical
 
 
-def load_team_ids(team_info_path="data/team_info.csv"):
+@lru_cache(maxsize=4)
+def load_team_ids(team_info_path: str = "data/team_info.csv"):
+    """
+    abbr -> team_id, lest én gang per sti. Dict-en deles mellom kallere og må ikke endres.
+    """
     _, abbr_to_id = load_team_mappings(team_info_path)
     return abbr_to_id
 
 
+FORM_METRICS = ("form_goals_for", "form_goals_against", "form_win_rate")
+
+
+def resolve_team_id(abbr: str, abbr_to_id: Dict[str, int]) -> int:
+    canonical = to_canonical(abbr)
+    if canonical in abbr_to_id:
+        return abbr_to_id[canonical]
+    if abbr in abbr_to_id:
+        return abbr_to_id[abbr]
+    raise ValueError(f"Mangler team_id for lag '{abbr}' (kanonisert: '{canonical}')")
+
+
+def _form_values(form: Dict[str, float], windows: Sequence[int]) -> List[float]:
+    """Form-verdiene i get_feature_columns-rekkefølge (metric ytterst, vindu innerst)."""
+    return [form[f"{metric}_w{w}"] for metric in FORM_METRICS for w in windows]
+
+
 def build_live_features(
     away_abbr: str,
     home_abbr: str,
     windows: Sequence[int] = DEFAULT_WINDOWS,
     home_games: Optional[List[Dict]] = None,
     away_games: Optional[List[Dict]] = None,
+    abbr_to_id: Optional[Dict[str, int]] = None,
 ) -> pd.DataFrame:
     """
     Lager en rad med nøyaktig de samme features som treningsdataen brukte.
+    Send inn `abbr_to_id` (f.eks. fra API-cachen) for å slippe å lese team_info.csv på nytt.
     """
 
-    # 1. form-features
-    if home_games is not None:
-        home_form = compute_team_form_from_games(home_abbr, home_games, windows=windows)
+    # 1. form-features (lag uten ferdighentede kamper hentes parallelt)
+    if home_games is None and away_games is None:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            home_future = pool.submit(compute_team_form, home_abbr, windows=windows)
+            away_future = pool.submit(compute_team_form, away_abbr, windows=windows)
+            home_form = home_future.result()
+            away_form = away_future.result()
     else:
-        home_form = compute_team_form(home_abbr, windows=windows)
+        if home_games is not None:
+            home_form = compute_team_form_from_games(home_abbr, home_games, windows=windows)
+        else:
+            home_form = compute_team_form(home_abbr, windows=windows)
 
-    if away_games is not None:
-        away_form = compute_team_form_from_games(away_abbr, away_games, windows=windows)
-    else:
-        away_form = compute_team_form(away_abbr, windows=windows)
+        if away_games is not None:
+            away_form = compute_team_form_from_games(away_abbr, away_games, windows=windows)
+        else:
+            away_form = compute_team_form(away_abbr, windows=windows)
 
     # 2. team_id-features
-    abbr_to_id = load_team_ids()
+    if abbr_to_id is None:
+        abbr_to_id = load_team_ids()
 
-    def _resolve_team_id(abbr: str) -> int:
-        canonical = to_canonical(abbr)
-        if canonical in abbr_to_id:
-            return abbr_to_id[canonical]
-        if abbr in abbr_to_id:
-            return abbr_to_id[abbr]
-        raise ValueError(f"Mangler team_id for lag '{abbr}' (kanonisert: '{canonical}')")
+    home_id = resolve_team_id(home_abbr, abbr_to_id)
+    away_id = resolve_team_id(away_abbr, abbr_to_id)
+
+    feature_cols = get_feature_columns(windows)
+    # CRUCIAL: same as training
+    values = _form_values(home_form, windows) + _form_values(away_form, windows) + [home_id, away_id]
+    # Kolonnevis konstruksjon beholder dtypene (float for form, int for team_id)
+    return pd.DataFrame({col: [value] for col, value in zip(feature_cols, values)}, columns=feature_cols)
 
-    home_id = _resolve_team_id(home_abbr)
-    away_id = _resolve_team_id(away_abbr)
 
-    row = {}
-    for w in windows:
-        row[f"home_form_goals_for_w{w}"] = home_form[f"form_goals_for_w{w}"]
-        row[f"home_form_goals_against_w{w}"] = home_form[f"form_goals_against_w{w}"]
-        row[f"home_form_win_rate_w{w}"] = home_form[f"form_win_rate_w{w}"]
+def build_live_features_batch(
+    away_abbrs: Sequence[str],
+    home_abbrs: Sequence[str],
+    windows: Sequence[int] = DEFAULT_WINDOWS,
+    team_games: Optional[Dict[str, List[Dict]]] = None,
+    abbr_to_id: Optional[Dict[str, int]] = None,
+) -> np.ndarray:
+    """
+    Feature-matrise (n_kamper, n_features) float32 for mange kamper i én allokering,
+    i samme kolonnerekkefølge som get_feature_columns(windows).
+    `team_games` (abbr -> siste kamper) brukes når den finnes; øvrige lag hentes parallelt.
+    Form regnes én gang per lag, uansett hvor mange kamper laget er med i.
+    """
+    if len(away_abbrs) != len(home_abbrs):
+        raise ValueError("away_abbrs og home_abbrs må ha samme lengde")
+    if abbr_to_id is None:
+        abbr_to_id = load_team_ids()
+    team_games = team_games or {}
 
-        row[f"away_form_goals_for_w{w}"] = away_form[f"form_goals_for_w{w}"]
-        row[f"away_form_goals_against_w{w}"] = away_form[f"form_goals_against_w{w}"]
-        row[f"away_form_win_rate_w{w}"] = away_form[f"form_win_rate_w{w}"]
+    teams = list(dict.fromkeys([*home_abbrs, *away_abbrs]))
+    missing = [abbr for abbr in teams if abbr not in team_games]
+    forms: Dict[str, Dict[str, float]] = {
+        abbr: compute_team_form_from_games(abbr, team_games[abbr], windows=windows)
+        for abbr in teams
+        if abbr in team_games
+    }
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+            forms.update(zip(missing, pool.map(lambda abbr: compute_team_form(abbr, windows=windows), missing)))
+    vectors = {abbr: _form_values(form, windows) for abbr, form in forms.items()}
 
-    # CRUCIAL: same as training
-    row["home_team_id"] = home_id
-    row["away_team_id"] = away_id
+    n_form = len(FORM_METRICS) * len(windows)
+    X = np.empty((len(home_abbrs), 2 * n_form + 2), dtype=np.float32)
+    for row, (away_abbr, home_abbr) in enumerate(zip(away_abbrs, home_abbrs)):
+        X[row, :n_form] = vectors[home_abbr]
+        X[row, n_form:2 * n_form] = vectors[away_abbr]
+    X[:, -2] = [resolve_team_id(abbr, abbr_to_id) for abbr in home_abbrs]
+    X[:, -1] = [resolve_team_id(abbr, abbr_to_id) for abbr in away_abbrs]
+    return X
 
-    feature_cols = get_feature_columns(windows)
 
-    return pd.DataFrame([row], columns=feature_cols)
+def feature_frame(X: np.ndarray, windows: Sequence[int] = DEFAULT_WINDOWS) -> pd.DataFrame:
+    """
+    Feature-matrise -> DataFrame med get_feature_columns-kolonnene, slik modellen ble trent.
+    Alle kallere gir predict_proba navngitte kolonner, så sklearn sjekker at de stemmer.
+    """
+    return pd.DataFrame(X, columns=get_feature_columns(windows))
@@ -1,20 +1,59 @@
 # live/nhl_api.py
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+
+from live.scoreboard_cache import cache_scoreboard, get_cached_scoreboard, is_fresh
 
 BASE = "https://api-web.nhle.com/v1"
 
 # Enkle caches for å redusere antall kall og unngå 429-rate limits
-_scoreboard_cache = {}
+# Scoreboards holdes i LRU-rekkefølge som (hentet_tidspunkt, data); eldste dato kastes
+# når grensen nås, og ferske datoer hentes på nytt etter scoreboard_cache.RECENT_TTL
+_scoreboard_cache = OrderedDict()
 _recent_games_cache = {}
+# Én lås per dato slik at parallelle oppslag ikke henter samme scoreboard to ganger
+_scoreboard_locks = {}
+_scoreboard_locks_guard = threading.Lock()
 MAX_DAYS_BACK = 120  # begrenser hvor langt tilbake vi søker (redusert for hastighet)
+SCOREBOARD_CACHE_SIZE = 256  # > MAX_DAYS_BACK slik at ett helt søk bakover får plass
 RETRY_PAUSE = 0.4
 MAX_RETRIES = 3
-HTTP_TIMEOUT = 5
+HTTP_TIMEOUT = (3, 5)  # (connect, read) i sekunder
+SCOREBOARD_BATCH_DAYS = 7  # antall dager som hentes parallelt per runde bakover
+RECENT_GAMES_TTL = 60  # sekunder før siste kamper for et lag hentes på nytt
+_recent_games_lock = threading.Lock()
+
+# Delt sesjon gjenbruker TCP/TLS-koblinger mot api-web.nhle.com mellom kall.
+# Bassenget er stort nok til de parallelle lag- og dato-oppslagene, slik at
+# koblinger ikke kastes når flere tråder henter samtidig (retry gjøres i get_json).
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=0))
+_session.headers.update({"User-Agent": "NHL-ML-Prediction-Model/1.0", "Accept": "application/json"})
+
 
+def clear_session():
+    """
+    Kaster alle keep-alive-koblinger i den delte sesjonen. Sesjonen kan brukes videre
+    og kobler opp på nytt ved neste kall, så en hengt socket ikke arves av senere oppslag.
+    """
+    _session.close()
 
+
+def close_session():
+    """Lukker delte keep-alive-koblinger (kalles ved nedstenging av API-et)."""
+    clear_session()
+
+
+@lru_cache(maxsize=4096)
 def _parse_dt(date_str: str):
+    # Samme kampdatoer går igjen for alle lag og oppslag; datetime er immutabel
     try:
         return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
     except Exception:
@@ -25,14 +64,18 @@ def get_json(url):
     last_exc = None
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.get(url, timeout=HTTP_TIMEOUT)
+            r = _session.get(url, timeout=HTTP_TIMEOUT)
             if r.status_code == 429 and attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_PAUSE * (attempt + 1))
                 continue
             r.raise_for_status()
-            return r.json()
+            # orjson parser rå bytes direkte, uten tekstdekoding via r.json()
+            return orjson.loads(r.content)
         except Exception as exc:
             last_exc = exc
+            if isinstance(exc, (requests.Timeout, requests.ConnectionError)):
+                # Ny kobling på neste forsøk i stedet for å gjenbruke en som kan henge
+                clear_session()
             if attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_PAUSE * (attempt + 1))
                 continue
@@ -43,13 +86,32 @@ def get_scoreboard(date):
     """
     Returns all games for the given date (YYYY-MM-DD)
     """
-    if date in _scoreboard_cache:
-        return _scoreboard_cache[date]
-
-    url = f"{BASE}/scoreboard/{date}"
-    data = get_json(url)
-    _scoreboard_cache[date] = data
-    return data
+    with _scoreboard_locks_guard:
+        entry = _scoreboard_cache.get(date)
+        if entry is not None and is_fresh(date, entry[0]):
+            _scoreboard_cache.move_to_end(date)
+            return entry[1]
+        lock = _scoreboard_locks.setdefault(date, threading.Lock())
+
+    with lock:
+        with _scoreboard_locks_guard:
+            entry = _scoreboard_cache.get(date)
+        if entry is not None and is_fresh(date, entry[0]):
+            return entry[1]
+
+        # Disk-cachen overlever prosessen; ferdigspilte datoer hentes bare én gang
+        entry = get_cached_scoreboard(date)
+        if entry is None:
+            url = f"{BASE}/scoreboard/{date}"
+            entry = (time.time(), get_json(url))
+            cache_scoreboard(date, entry[1], entry[0])
+        with _scoreboard_locks_guard:
+            _scoreboard_cache[date] = entry
+            _scoreboard_cache.move_to_end(date)
+            while len(_scoreboard_cache) > SCOREBOARD_CACHE_SIZE:
+                evicted, _ = _scoreboard_cache.popitem(last=False)
+                _scoreboard_locks.pop(evicted, None)
+        return entry[1]
 
 
 # 2) GET GAMECENTER BOXCORE
@@ -69,73 +131,111 @@ def get_play_by_play(game_id):
     return get_json(url)
 
 
+def clear_recent_games_cache():
+    with _recent_games_lock:
+        _recent_games_cache.clear()
+
+
 # 3) GET LAST GAMES FOR A TEAM
 def get_team_recent_games(team_abbr, limit=5):
     """
     Collect recent games for a team ID or abbreviation.
-    We fetch multiple scoreboard days backwards until we have N games.
+    Uses the team's season schedule; falls back to fetching scoreboard days
+    backwards until we have N games.
     """
 
     cache_key = (team_abbr, limit)
-    if cache_key in _recent_games_cache:
-        return list(_recent_games_cache[cache_key])
+    with _recent_games_lock:
+        cached = _recent_games_cache.get(cache_key)
+    if cached is not None and time.time() - cached[0] < RECENT_GAMES_TTL:
+        return list(cached[1])
 
     from datetime import datetime, timedelta
 
     collected = []
     seen = set()
-    days_back = 0
-
-    while len(collected) < limit and days_back < MAX_DAYS_BACK:
-        date = (datetime.utcnow() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-        sb = get_scoreboard(date)
-
-        # Scoreboard-response kan komme i to former: gamesByDate eller games
-        if "gamesByDate" in sb and sb["gamesByDate"]:
-            day_games = []
-            for day in sb["gamesByDate"]:
-                day_games.extend(day.get("games", []))
-        else:
-            day_games = sb.get("games", [])
-
-        for game in day_games:
-            away = game.get("awayTeam", {}).get("abbrev")
-            home = game.get("homeTeam", {}).get("abbrev")
-            if not away or not home:
-                continue
+    today = datetime.utcnow().date()
+    # Alle kandidatdatoer (nyeste først) bygges én gang i stedet for per iterasjon
+    dates = [(today - timedelta(days=d)).isoformat() for d in range(MAX_DAYS_BACK)]
 
-            if away != team_abbr and home != team_abbr:
-                continue
+    # Lagets sesongprogram gir alle kampene i ett kall; scoreboard-søket bakover
+    # brukes bare når endepunktet feiler eller sesongen har for få ferdigspilte kamper.
+    try:
+        schedule = get_json(f"{BASE}/club-schedule-season/{team_abbr}/now")
+    except (requests.RequestException, ValueError):
+        schedule = None
+    if schedule:
+        oldest, newest = dates[-1], dates[0]
+        in_range = [
+            g
+            for g in schedule.get("games") or []
+            if oldest <= (g.get("gameDate") or g.get("startTimeUTC") or "")[:10] <= newest
+        ]
+        in_range.sort(key=lambda g: (g.get("gameDate") or g.get("startTimeUTC") or "")[:10], reverse=True)
+        _collect_team_games({"games": in_range}, team_abbr, limit, collected, seen)
+        if len(collected) < limit:
+            collected = []
+            seen = set()
+
+    # Fallback: scoreboards hentes i parallelle puljer, men behandles i dato-rekkefølge
+    # slik at resultatet (og feil som kastes) blir det samme som ved ett og ett oppslag.
+    # Poolen lages bare når sesongprogrammet ikke holdt, og venter inn pågående kall.
+    if len(collected) < limit:
+        with ThreadPoolExecutor(max_workers=SCOREBOARD_BATCH_DAYS) as pool:
+            for start in range(0, len(dates), SCOREBOARD_BATCH_DAYS):
+                if len(collected) >= limit:
+                    break
+                batch = [pool.submit(get_scoreboard, date) for date in dates[start:start + SCOREBOARD_BATCH_DAYS]]
+                for future in batch:
+                    if len(collected) >= limit:
+                        break
+                    _collect_team_games(future.result(), team_abbr, limit, collected, seen)
+
+    # key= regnes én gang per kamp; sorteres på stedet siden listen er vår egen
+    collected.sort(key=lambda x: _parse_dt(x.get("date")) or x.get("date"), reverse=True)
+    with _recent_games_lock:
+        _recent_games_cache[cache_key] = (time.time(), list(collected))
+    return collected
 
-            game_state = game.get("gameState", "").upper()
-            if game_state not in {"OFF", "FINAL"}:
-                continue  # ikke ferdigspilt
 
-            key = game.get("id") or f"{home}|{away}|{game.get('gameDate') or game.get('startTimeUTC')}"
-            if key in seen:
-                continue
-            seen.add(key)
-
-            collected.append(
-                {
-                    "id": game.get("id"),
-                    "date": game.get("gameDate") or game.get("startTimeUTC"),
-                    "away": away,
-                    "home": home,
-                    "away_goals": game.get("awayTeam", {}).get("score"),
-                    "home_goals": game.get("homeTeam", {}).get("score"),
-                }
-            )
-
-            if len(collected) >= limit:
-                break
-
-        days_back += 1
-
-    collected = sorted(
-        collected,
-        key=lambda x: _parse_dt(x.get("date")) or x.get("date"),
-        reverse=True,
-    )
-    _recent_games_cache[cache_key] = list(collected)
-    return collected
+def _collect_team_games(sb, team_abbr, limit, collected, seen):
+    """Legger ferdigspilte kamper for laget fra ett scoreboard til `collected`."""
+    # Scoreboard-response kan komme i to former: gamesByDate eller games.
+    # Kampene hentes lat slik at løkken kan stoppe ved `limit` uten å bygge hele listen.
+    games_by_date = sb.get("gamesByDate")
+    if games_by_date:
+        day_games = (game for day in games_by_date for game in day.get("games", ()))
+    else:
+        day_games = sb.get("games", ())
+
+    for game in day_games:
+        away = game.get("awayTeam", {}).get("abbrev")
+        home = game.get("homeTeam", {}).get("abbrev")
+        if not away or not home:
+            continue
+
+        if away != team_abbr and home != team_abbr:
+            continue
+
+        game_state = game.get("gameState", "").upper()
+        if game_state not in {"OFF", "FINAL"}:
+            continue  # ikke ferdigspilt
+
+        key = game.get("id") or f"{home}|{away}|{game.get('gameDate') or game.get('startTimeUTC')}"
+        if key in seen:
+            continue
+        seen.add(key)
+
+        collected.append(
+            {
+                "id": game.get("id"),
+                "date": game.get("gameDate") or game.get("startTimeUTC"),
+                "away": away,
+                "home": home,
+                "away_goals": game.get("awayTeam", {}).get("score"),
+                "home_goals": game.get("homeTeam", {}).get("score"),
+            }
+        )
+
+        if len(collected) >= limit:
+            break
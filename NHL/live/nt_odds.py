@@ -1,55 +1,115 @@
+import csv
+import threading
+import time
+
 import requests
-import pandas as pd
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
+from utils.pickle_cache import read_pickle_cache, write_pickle_cache
 from utils.team_alias import to_display
 
 NT_BASE_ALL = "https://api.norsk-tipping.no/OddsenGameInfo/v1/api/events/HKY"
 NT_BASE_RANGE = "https://api.norsk-tipping.no/OddsenGameInfo/v1/api/events/HKY"  # bruke HKY + params, daterange feiler uten /HKY
 BASE_DIR = Path(__file__).resolve().parent.parent
 TEAM_CSV_PATH = BASE_DIR / "data" / "team_info.csv"
+# Ferdigbygd lagnavn-mapping; gyldig så lenge team_info.csv og de manuelle aliasene er uendret
+TEAM_MAP_CACHE_PATH = BASE_DIR / "data" / ".team_map.pkl"
 HTTP_TIMEOUT = 5
+MATCHES_TTL = 120  # odds endres sjelden oftere enn hvert par minutter
+
+# (dager, dato) -> (tidspunkt, kamper); slår sammen like kall fra /value-report og /portfolio/update
+_matches_cache = {}
+_matches_lock = threading.Lock()
+
+# (url, params) -> (ETag, Last-Modified, eventList) fra siste 200-svar; brukes ved 304
+_conditional_cache = {}
+_conditional_lock = threading.Lock()
+CONDITIONAL_CACHE_SIZE = 32
+
+# Delt sesjon gjenbruker koblingen mot Norsk Tipping mellom kall
+_session = requests.Session()
 
 
+def close_session():
+    """Lukker delte keep-alive-koblinger (kalles ved nedstenging av API-et)."""
+    _session.close()
+
+
+@lru_cache(maxsize=4096)
 def _normalize(name: str) -> str:
+    # De samme lagnavnene går igjen på hvert NT-event; normaliseringen caches per navn
     return "".join(ch for ch in name.upper() if ch.isalnum())
 
 
+MANUAL_ALIAS = {
+    "UTAHMAMMOTH": "UTA",  # bruker UTA som visningsnavn, kanoniseres senere ved behov
+    "UTAH": "UTA",
+    "UTA": "UTA",
+    "NEWYORKISLANDERS": "NYI",  # NT bruker ofte fulle bynavn
+    "NEWYORKRANGERS": "NYR",
+}
+
+
 def load_team_map():
     """Lager mapping fra NT sine lagnavn → NHL-abbreviation med flere varianter."""
-    df = pd.read_csv(TEAM_CSV_PATH)
     mapping = {}
-    manual_alias = {
-        "UTAHMAMMOTH": "UTA",  # bruker UTA som visningsnavn, kanoniseres senere ved behov
-        "UTAH": "UTA",
-        "UTA": "UTA",
-        "NEWYORKISLANDERS": "NYI",  # NT bruker ofte fulle bynavn
-        "NEWYORKRANGERS": "NYR",
-    }
 
-    for _, row in df.iterrows():
-        abbr = row["abbreviation"]
-        short = str(row["shortName"])
-        team = str(row["teamName"])
+    # Liten statisk fil; csv-modulen holder pandas utenfor import av modulen
+    with open(TEAM_CSV_PATH, newline="") as f:
+        for row in csv.DictReader(f):
+            abbr = row["abbreviation"]
+            short = row["shortName"]
+            team = row["teamName"]
 
-        variants = {
-            short,
-            team,
-            f"{short} {team}",
-            abbr,
-        }
+            variants = {
+                short,
+                team,
+                f"{short} {team}",
+                abbr,
+            }
 
-        for v in variants:
-            mapping[_normalize(v)] = abbr
+            for v in variants:
+                mapping[_normalize(v)] = abbr
 
     # Legg inn manuelle alias som ikke finnes i team_info.csv
-    mapping.update(manual_alias)
+    mapping.update(MANUAL_ALIAS)
 
     return mapping
 
 
-TEAM_MAP = load_team_map()
+def _team_map_source():
+    st = TEAM_CSV_PATH.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _read_team_map_snapshot():
+    snapshot = read_pickle_cache(TEAM_MAP_CACHE_PATH)
+    try:
+        if snapshot["source"] == _team_map_source() and snapshot["manual_alias"] == MANUAL_ALIAS:
+            return snapshot["mapping"]
+    except Exception:
+        pass
+    return None
+
+
+def _write_team_map_snapshot(mapping):
+    snapshot = {"source": _team_map_source(), "manual_alias": MANUAL_ALIAS, "mapping": mapping}
+    write_pickle_cache(TEAM_MAP_CACHE_PATH, snapshot, "team map cache")
+
+
+@lru_cache(maxsize=1)
+def _team_map():
+    """
+    Mappingen bygges først når et NT-event faktisk skal mappes, og leses fra
+    TEAM_MAP_CACHE_PATH når team_info.csv ikke er endret siden forrige kjøring.
+    """
+    mapping = _read_team_map_snapshot()
+    if mapping is None:
+        mapping = load_team_map()
+        _write_team_map_snapshot(mapping)
+    return mapping
 
 
 def _map_team(ev: dict, participant_key: str, short_key: str):
@@ -57,7 +117,7 @@ def _map_team(ev: dict, participant_key: str, short_key: str):
 
     def _lookup(value: str):
         norm = _normalize(value)
-        return TEAM_MAP.get(norm)
+        return _team_map().get(norm)
 
     name = ev.get(participant_key)
     short_name = ev.get(short_key)
@@ -82,43 +142,82 @@ def _map_team(ev: dict, participant_key: str, short_key: str):
     return display_name, to_display(abbr) if abbr else abbr
 
 
-def _fetch_events_range(days: int):
+def _fetch_events_range(days: int, start_date=None):
     """
-    Bruker NT sitt daterange-endepunkt slik at vi får hele intervallet.
+    Bruker NT sitt daterange-endepunkt slik at vi får hele intervallet
+    [start_date, start_date + days] (start_date er i dag hvis ikke gitt).
     Fra-dato settes til 00:00, til-dato til 23:59 som NT krever.
     """
-    today = datetime.utcnow().date()
-    end_date = today + timedelta(days=days)
+    if start_date is None:
+        start_date = datetime.utcnow().date()
+    end_date = start_date + timedelta(days=days)
     params = {
         "eventType": "HKY",
-        "fromDateTime": f"{today:%Y-%m-%d}T0000",
+        "fromDateTime": f"{start_date:%Y-%m-%d}T0000",
         "toDateTime": f"{end_date:%Y-%m-%d}T2359",
     }
-    r = requests.get(NT_BASE_RANGE, params=params, timeout=HTTP_TIMEOUT)
-    if r.status_code != 200:
-        raise RuntimeError(f"NT range API error: {r.status_code} {r.text}")
-    return r.json().get("eventList", [])
+    return _get_event_list(NT_BASE_RANGE, params, "NT range API error: {status} {text}")
 
 
-def get_hockey_events(days: int):
+def get_hockey_events(days: int, start_date=None):
     """
-    Returnerer hockey-events for intervallet [i dag, i dag + days].
+    Returnerer hockey-events for intervallet [start_date, start_date + days]
+    (start_date er i dag hvis ikke gitt).
     Faller tilbake til gamle /events/HKY hvis daterange feiler.
     """
-    events = _fetch_events_range(days)
+    events = _fetch_events_range(days, start_date)
     if events:
         return events
 
     # Fallback til gamle all-in-one endepunkt
-    r = requests.get(NT_BASE_ALL, timeout=HTTP_TIMEOUT)
+    return _get_event_list(NT_BASE_ALL, None, "NT API error (fallback): {status}")
+
+
+def _get_event_list(url, params, error_message):
+    """
+    Henter eventList med betinget GET: ETag/Last-Modified fra forrige svar sendes med,
+    og ved 304 gjenbrukes den allerede parsede listen uten ny nedlasting.
+    """
+    key = (url, tuple(sorted(params.items())) if params else ())
+    with _conditional_lock:
+        cached = _conditional_cache.get(key)
+
+    headers = {}
+    if cached is not None:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    r = _session.get(url, params=params, headers=headers, timeout=HTTP_TIMEOUT)
+    if r.status_code == 304 and cached is not None:
+        return cached[2]
     if r.status_code != 200:
-        raise RuntimeError(f"NT API error (fallback): {r.status_code}")
-    return r.json().get("eventList", [])
+        raise RuntimeError(error_message.format(status=r.status_code, text=r.text))
+    events = r.json().get("eventList", [])
+
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    with _conditional_lock:
+        _conditional_cache.pop(key, None)
+        if etag or last_modified:
+            _conditional_cache[key] = (etag, last_modified, events)
+            # Eldste datointervaller kastes så cachen ikke vokser over tid
+            while len(_conditional_cache) > CONDITIONAL_CACHE_SIZE:
+                del _conditional_cache[next(iter(_conditional_cache))]
+    return events
 
 
 def _parse_start_time(start: str):
-    if not start:
+    if not start or not isinstance(start, str):
         return None
+    return _parse_start_time_str(start)
+
+
+@lru_cache(maxsize=1024)
+def _parse_start_time_str(start: str):
+    # Samme startTime går igjen mellom range- og dagsoppslag; datetime er immutabel
     try:
         return datetime.fromisoformat(start.replace("Z", "+00:00"))
     except Exception:
@@ -128,26 +227,76 @@ def _parse_start_time(start: str):
 def get_nhl_matches_range(days=3):
     """
     Returnerer NHL-kamper fra Norsk Tipping for intervallet [i dag, i dag + days].
-    Bruker én fetch og filtrerer på dato i startTime.
+    Resultatet caches i MATCHES_TTL sekunder per (days, dato).
+    """
+    today = datetime.utcnow().date()
+    return _cached_matches(days, today, lambda: _fetch_nhl_matches_range(days, today))
+
+
+def get_nhl_matches(days_ahead=0):
+    """
+    Bakoverkompatibel: returnerer kamper for én dato (i dag + days_ahead).
+    Henter bare den ene datoen fra NT i stedet for hele intervallet frem til den.
     """
-    events = get_hockey_events(days)
     today = datetime.utcnow().date()
-    max_date = today + timedelta(days=days)
+    target_date = today + timedelta(days=days_ahead)
+
+    def fetch():
+        return _build_nhl_games(get_hockey_events(0, target_date), target_date, target_date)
+
+    return _cached_matches(("dag", days_ahead), today, fetch)
+
+
+def _cached_matches(key, today, fetch):
+    """Felles MATCHES_TTL-cache for range- og dagsoppslag, nøklet på (key, dato)."""
+    cache_key = (key, today)
+    with _matches_lock:
+        cached = _matches_cache.get(cache_key)
+    if cached is not None and time.time() - cached[0] < MATCHES_TTL:
+        return list(cached[1])
+
+    games = fetch()
+    with _matches_lock:
+        # Kast oppføringer fra tidligere datoer så cachen ikke vokser over tid
+        for k in [k for k in _matches_cache if k[1] != today]:
+            del _matches_cache[k]
+        _matches_cache[cache_key] = (time.time(), games)
+    return list(games)
+
 
+def clear_matches_cache():
+    with _matches_lock:
+        _matches_cache.clear()
+
+
+def _fetch_nhl_matches_range(days, today):
+    """Bruker én fetch og filtrerer på dato i startTime."""
+    events = get_hockey_events(days)
+    return _build_nhl_games(events, today, today + timedelta(days=days))
+
+
+@lru_cache(maxsize=256)
+def _is_nhl_tournament(name: str) -> bool:
+    # NT har få turneringsnavn som går igjen på hvert event; avgjørelsen caches per navn
+    return "NHL" in name.upper()
+
+
+def _build_nhl_games(events, start_date, end_date):
+    """NHL-kamper blant `events` med startdato i [start_date, end_date], i ett pass."""
     nhl_games = []
 
     for ev in events:
         # vi skal kun ha NHL
-        tournament_name = ev.get("tournament", {}).get("name", "")
-        if "NHL" not in tournament_name.upper():
+        tournament_name = (ev.get("tournament") or {}).get("name")
+        if not tournament_name or not _is_nhl_tournament(tournament_name):
             continue
 
         start_time = _parse_start_time(ev.get("startTime"))
         if not start_time:
             continue
 
-        start_date = start_time.date()
-        if start_date < today or start_date > max_date:
+        game_date = start_time.date()
+        if game_date < start_date or game_date > end_date:
             continue
 
         market = ev.get("mainMarket", {}) or {}
@@ -181,18 +330,6 @@ def get_nhl_matches_range(days=3):
     return nhl_games
 
 
-def get_nhl_matches(days_ahead=0):
-    """
-    Bakoverkompatibel: returnerer kamper for én dato (i dag + days_ahead).
-    """
-    today = datetime.utcnow().date()
-    target_date = today + timedelta(days=days_ahead)
-    return [
-        g for g in get_nhl_matches_range(days_ahead)
-        if _parse_start_time(g.get("startTime")) and _parse_start_time(g.get("startTime")).date() == target_date
-    ]
-
-
 if __name__ == "__main__":
     from pprint import pprint
 
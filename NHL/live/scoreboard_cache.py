@@ -0,0 +1,98 @@
+"""
+Disk-based cache for NHL scoreboards, keyed by date (YYYY-MM-DD).
+
+A past day's scoreboard no longer changes, so an entry fetched two or more days
+after its date is kept indefinitely. Today's and yesterday's scoreboards, and entries
+fetched before the day was over, expire after a short TTL.
+"""
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import orjson
+
+# Cache directory
+CACHE_DIR = Path(__file__).parent.parent / "data" / ".scoreboard_cache"
+
+# TTL in seconds for scoreboards that may still change
+RECENT_TTL = 60
+
+# Days after the game date from which a fetched scoreboard counts as final
+SETTLED_AFTER_DAYS = 2
+
+
+def is_fresh(date_str: str, fetched_at: float, ttl: float = RECENT_TTL) -> bool:
+    """True if a scoreboard for `date_str` fetched at `fetched_at` can still be used."""
+    try:
+        day = date.fromisoformat(date_str)
+        fetched_day = datetime.fromtimestamp(fetched_at, timezone.utc).date()
+    except (ValueError, OverflowError, OSError):
+        day = fetched_day = None
+    if day is not None and (fetched_day - day).days >= SETTLED_AFTER_DAYS:
+        return True
+    return time.time() - fetched_at < ttl
+
+
+class ScoreboardCache:
+    """Simple file-based cache for scoreboards, one JSON file per date."""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl: int = RECENT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _cache_path(self, date_str: str) -> Path:
+        """Get cache file path for a date."""
+        return self.cache_dir / f"{date_str}.json"
+
+    def get(self, date_str: str) -> Optional[Tuple[float, Dict]]:
+        """Get (fetched_at, scoreboard) for a date if still usable."""
+        try:
+            # orjson parses the raw bytes, no text decoding
+            data = orjson.loads(self._cache_path(date_str).read_bytes())
+            timestamp = float(data["timestamp"])
+            scoreboard = data["scoreboard"]
+        except (orjson.JSONDecodeError, KeyError, TypeError, ValueError, OSError):
+            return None
+
+        if not is_fresh(date_str, timestamp, self.ttl):
+            return None
+        return timestamp, scoreboard
+
+    def set(self, date_str: str, scoreboard: Dict, timestamp: Optional[float] = None):
+        """Cache the scoreboard for a date."""
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._cache_path(date_str).write_bytes(
+                orjson.dumps({"timestamp": timestamp, "scoreboard": scoreboard})
+            )
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Could not write scoreboard cache for {date_str}: {e}")
+
+    def clear(self):
+        """Clear all cache files."""
+        for cache_file in self.cache_dir.glob("*.json"):
+            try:
+                cache_file.unlink()
+            except OSError:
+                pass
+
+
+# Global cache instance
+_cache = ScoreboardCache()
+
+
+def get_cached_scoreboard(date_str: str) -> Optional[Tuple[float, Dict]]:
+    """Get cached (fetched_at, scoreboard) for a date."""
+    return _cache.get(date_str)
+
+
+def cache_scoreboard(date_str: str, scoreboard: Dict, timestamp: Optional[float] = None):
+    """Cache the scoreboard for a date."""
+    _cache.set(date_str, scoreboard, timestamp)
+
+
+def clear_scoreboard_cache():
+    """Clear all cached scoreboards."""
+    _cache.clear()
@@ -1,11 +1,12 @@
 """
 Simple disk-based cache for team recent games to avoid hammering NHL API.
 """
-import json
 import time
 from pathlib import Path
 from typing import Dict, List, Optional
 
+import orjson
+
 # Cache directory
 CACHE_DIR = Path(__file__).parent.parent / "data" / ".team_cache"
 CACHE_DIR.mkdir(exist_ok=True)
@@ -40,8 +41,8 @@ class TeamCache:
             return None
         
         try:
-            with open(cache_file, 'r') as f:
-                data = json.load(f)
+            # orjson parses the raw bytes, no text decoding
+            data = orjson.loads(cache_file.read_bytes())
             
             timestamp = data.get('timestamp', 0)
             games = data.get('games', [])
@@ -54,7 +55,7 @@ class TeamCache:
             self._memory_cache[team_abbr] = (timestamp, games)
             return games
         
-        except (json.JSONDecodeError, KeyError, OSError):
+        except (orjson.JSONDecodeError, KeyError, OSError):
             return None
     
     def set(self, team_abbr: str, games: List):
@@ -67,11 +68,10 @@ class TeamCache:
         # Store on disk
         cache_file = self._cache_path(team_abbr)
         try:
-            with open(cache_file, 'w') as f:
-                json.dump({
-                    'timestamp': timestamp,
-                    'games': games
-                }, f)
+            cache_file.write_bytes(orjson.dumps({
+                'timestamp': timestamp,
+                'games': games
+            }))
         except OSError as e:
             print(f"Warning: Could not write cache for {team_abbr}: {e}")
     
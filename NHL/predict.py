@@ -1,20 +1,123 @@
 # predict.py
+import hashlib
 import sys
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+from utils import data_loader, feature_engineering
 from utils.data_loader import load_and_prepare_games
 from utils.feature_engineering import (
     DEFAULT_WINDOWS,
     build_team_long_df,
     add_multiwindow_form,
     get_latest_team_form,
+    get_latest_team_forms,
     get_feature_columns,
 )
 from utils.model_utils import load_model
+from utils.pickle_cache import read_pickle_cache, write_pickle_cache
 
 
 LABELS = ["Home Win", "OT / SO", "Away Win"]
 
+# Ferdigbygd kontekst (kamper + long_df med form) lagres her mellom kjøringer
+CONTEXT_CACHE_DIR = Path(__file__).resolve().parent / "data" / ".cache"
+
+
+def _context_cache_key(game_path: Path, team_path: Path, windows) -> str:
+    """
+    Nøkkel fra størrelse/mtime på CSV-ene og kildefilene som bygger konteksten,
+    slik at både nye data og endret feature-kode gir ny cache.
+    """
+    parts = []
+    sources = (Path(__file__), Path(data_loader.__file__), Path(feature_engineering.__file__))
+    for path in (game_path, team_path, *sources):
+        st = path.stat()
+        parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+    parts.append(",".join(str(w) for w in windows))
+    return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def load_context(
+    game_path: str = "data/game.csv",
+    team_path: str = "data/team_info.csv",
+    windows=DEFAULT_WINDOWS,
+):
+    """
+    Returnerer (games_df, abbr_to_id, long_df med form, siste form per lag). Første kjøring
+    bygger fra CSV og lagrer resultatet i data/.cache; senere kjøringer med uendrede filer
+    leser pickle.
+    """
+    game_path_resolved = data_loader._resolve_path(game_path)
+    team_path_resolved = data_loader._resolve_path(team_path)
+    try:
+        key = _context_cache_key(game_path_resolved, team_path_resolved, windows)
+    except OSError:
+        key = None  # manglende fil: load_and_prepare_games gir den vanlige feilen
+    cache_file = CONTEXT_CACHE_DIR / f"predict_context_{key}.pkl" if key else None
+    if cache_file is not None:
+        context = read_pickle_cache(cache_file)
+        if isinstance(context, tuple) and len(context) == 4:
+            return context
+
+    print("Loading games and teams...")
+    games_df, _, abbr_to_id = load_and_prepare_games(game_path, team_path)
+
+    print("Building long dataframe and forms...")
+    long_df = build_team_long_df(games_df)
+    long_df = add_multiwindow_form(long_df, windows=windows)
+    latest_form = get_latest_team_forms(long_df, windows=windows)
+    context = (games_df, abbr_to_id, long_df, latest_form)
+
+    if cache_file is not None:
+        write_pickle_cache(cache_file, context, "context cache", stale_glob="predict_context_*.pkl")
+    return context
+
+
+def last_games_by_team(long_df: pd.DataFrame, n: int = 5, teams=None) -> dict:
+    """
+    Siste n kamper per lag (eldst først), plukket ut med én sortering + groupby.tail
+    i stedet for filter + sort per lag. Med `teams` sorteres bare radene til de lagene.
+    """
+    if teams is not None:
+        long_df = long_df[long_df["team"].isin(teams)]
+    last_n = (
+        long_df.sort_values(["team", "date"], kind="stable")
+        .groupby("team", sort=False, observed=True)
+        .tail(n)
+    )
+    return {team: games for team, games in last_n.groupby("team", sort=False, observed=True)}
+
+
+def summarize_last_games(games_df: pd.DataFrame) -> dict:
+    """
+    Snittmål, record og vinn% per lag for kampene i games_df, regnet med én groupby.agg.
+    """
+    agg = games_df.groupby("team", observed=True).agg(
+        gf=("goals_for", "mean"),
+        ga=("goals_against", "mean"),
+        wins=("win", "sum"),
+        games=("win", "size"),
+    )
+    stats = {}
+    for team, gf, ga, wins, games in zip(
+        agg.index,
+        agg["gf"].to_numpy(),
+        agg["ga"].to_numpy(),
+        agg["wins"].to_numpy(),
+        agg["games"].to_numpy(),
+    ):
+        stats[team] = {
+            "GF": round(gf, 2),
+            "GA": round(ga, 2),
+            "W": wins,
+            "L": games - wins,
+            "Win%": round(wins / games * 100, 1),
+        }
+    return stats
+
 
 def display_last_5_games(long_df: pd.DataFrame, home_abbr: str, away_abbr: str):
     """
@@ -25,23 +128,29 @@ def display_last_5_games(long_df: pd.DataFrame, home_abbr: str, away_abbr: str):
     print("="*80)
     
     # Hent siste 5 kamper for hvert lag
-    home_games = long_df[long_df["team"] == home_abbr].sort_values("date").tail(5)
-    away_games = long_df[long_df["team"] == away_abbr].sort_values("date").tail(5)
+    last_5 = last_games_by_team(long_df, n=5, teams=(home_abbr, away_abbr))
+    no_games = long_df.iloc[0:0]
+    home_games = last_5.get(home_abbr, no_games)
+    away_games = last_5.get(away_abbr, no_games)
     
-    # Forbered data for visning
-    def format_game_row(row):
-        venue = "H" if row["is_home"] == 1 else "A"
-        result = "W" if row["win"] == 1 else "L"
-        date_str = row["date"].strftime("%Y-%m-%d")
-        score = f"{row['goals_for']}-{row['goals_against']}"
-        return f"{date_str} ({venue}) {result} {score}"
+    # Forbered data for visning (henter kolonnene som arrays i stedet for iterrows)
+    def format_game_rows(games_df):
+        dates = games_df["date"].dt.strftime("%Y-%m-%d").to_numpy()
+        venues = np.where(games_df["is_home"].to_numpy() == 1, "H", "A")
+        results = np.where(games_df["win"].to_numpy() == 1, "W", "L")
+        goals_for = games_df["goals_for"].to_numpy()
+        goals_against = games_df["goals_against"].to_numpy()
+        return [
+            f"{d} ({v}) {r} {gf}-{ga}"
+            for d, v, r, gf, ga in zip(dates, venues, results, goals_for, goals_against)
+        ]
     
     # Vis lagene side ved side
     print(f"\n{home_abbr:^40} | {away_abbr:^40}")
     print("-"*40 + "|" + "-"*40)
     
-    home_list = [format_game_row(row) for _, row in home_games.iterrows()]
-    away_list = [format_game_row(row) for _, row in away_games.iterrows()]
+    home_list = format_game_rows(home_games)
+    away_list = format_game_rows(away_games)
     
     # Fyll opp med tomme hvis det er færre enn 5 kamper
     while len(home_list) < 5:
@@ -52,25 +161,11 @@ def display_last_5_games(long_df: pd.DataFrame, home_abbr: str, away_abbr: str):
     for h, a in zip(home_list, away_list):
         print(f"{h:40} | {a:40}")
     
-    # Beregn statistikk for siste 5
-    def calc_stats(games_df):
-        if games_df.empty:
-            return {"GF": 0, "GA": 0, "W": 0, "L": 0, "Win%": 0}
-        gf = games_df["goals_for"].mean()
-        ga = games_df["goals_against"].mean()
-        wins = games_df["win"].sum()
-        losses = len(games_df) - wins
-        win_pct = (wins / len(games_df) * 100) if len(games_df) > 0 else 0
-        return {
-            "GF": round(gf, 2),
-            "GA": round(ga, 2),
-            "W": wins,
-            "L": losses,
-            "Win%": round(win_pct, 1)
-        }
-    
-    home_stats = calc_stats(home_games)
-    away_stats = calc_stats(away_games)
+    # Statistikk for begge lag i én groupby.agg i stedet for mean/sum/len per lag
+    stats_by_team = summarize_last_games(pd.concat([home_games, away_games]))
+    empty_stats = {"GF": 0, "GA": 0, "W": 0, "L": 0, "Win%": 0}
+    home_stats = stats_by_team.get(home_abbr, empty_stats)
+    away_stats = stats_by_team.get(away_abbr, empty_stats)
     
     # Formater strings utenfor f-string for å unngå backslash-problemer
     home_record = f"{home_stats['W']}-{home_stats['L']}"
@@ -90,6 +185,39 @@ def display_last_5_games(long_df: pd.DataFrame, home_abbr: str, away_abbr: str):
     print("="*80 + "\n")
 
 
+def build_feature_matrix(
+    pairs,
+    long_df_with_form: pd.DataFrame,
+    abbr_to_id: dict,
+    windows=DEFAULT_WINDOWS,
+    latest_form: dict = None,
+) -> pd.DataFrame:
+    """
+    Features for mange matchups [(home_abbr, away_abbr), ...] som én DataFrame
+    (én rad per matchup, kolonner i get_feature_columns-rekkefølge), så modellen
+    kan kalles én gang for hele runden. Formen slås opp én gang per lag.
+    """
+    pairs = list(pairs)
+    teams = dict.fromkeys(abbr for pair in pairs for abbr in pair)
+    forms = {
+        abbr: get_latest_team_form(long_df_with_form, abbr, windows=windows, latest_form=latest_form)
+        for abbr in teams
+    }
+
+    columns = {}
+    for side, pos in (("home", 0), ("away", 1)):
+        for metric in ("form_goals_for", "form_goals_against", "form_win_rate"):
+            for w in windows:
+                key = f"{metric}_w{w}"
+                columns[f"{side}_{key}"] = np.fromiter(
+                    (forms[pair[pos]][key] for pair in pairs), dtype=np.float64, count=len(pairs)
+                )
+    columns["home_team_id"] = np.fromiter((abbr_to_id[h] for h, _ in pairs), dtype=np.int64, count=len(pairs))
+    columns["away_team_id"] = np.fromiter((abbr_to_id[a] for _, a in pairs), dtype=np.int64, count=len(pairs))
+
+    return pd.DataFrame(columns, columns=get_feature_columns(windows))
+
+
 def build_feature_row(
     home_abbr: str,
     away_abbr: str,
@@ -97,28 +225,20 @@ def build_feature_row(
     long_df_with_form: pd.DataFrame,
     abbr_to_id: dict,
     windows=DEFAULT_WINDOWS,
+    latest_form: dict = None,
 ):
     """
     Lager én rad med features for en gitt matchup.
     Bruker samme featurer som under trening.
+    `latest_form` (fra get_latest_team_forms) sparer et søk i long_df per lag.
     """
-    home_form = get_latest_team_form(long_df_with_form, home_abbr, windows=windows)
-    away_form = get_latest_team_form(long_df_with_form, away_abbr, windows=windows)
-
-    row = {}
-    for w in windows:
-        row[f"home_form_goals_for_w{w}"] = home_form[f"form_goals_for_w{w}"]
-        row[f"home_form_goals_against_w{w}"] = home_form[f"form_goals_against_w{w}"]
-        row[f"home_form_win_rate_w{w}"] = home_form[f"form_win_rate_w{w}"]
-
-        row[f"away_form_goals_for_w{w}"] = away_form[f"form_goals_for_w{w}"]
-        row[f"away_form_goals_against_w{w}"] = away_form[f"form_goals_against_w{w}"]
-        row[f"away_form_win_rate_w{w}"] = away_form[f"form_win_rate_w{w}"]
-
-    row["home_team_id"] = abbr_to_id[home_abbr]
-    row["away_team_id"] = abbr_to_id[away_abbr]
-
-    return pd.DataFrame([row], columns=get_feature_columns(windows))
+    return build_feature_matrix(
+        [(home_abbr, away_abbr)],
+        long_df_with_form,
+        abbr_to_id,
+        windows=windows,
+        latest_form=latest_form,
+    )
 
 
 def predict_match(
@@ -128,14 +248,7 @@ def predict_match(
     team_path: str = "data/team_info.csv",
     model_path: str = "models/nhl_model.pkl",
 ):
-    print(f"Loading games and teams...")
-    games_df, id_to_abbr, abbr_to_id = load_and_prepare_games(
-        game_path, team_path
-    )
-
-    print("Building long dataframe and forms...")
-    long_df = build_team_long_df(games_df)
-    long_df = add_multiwindow_form(long_df, windows=DEFAULT_WINDOWS)
+    games_df, abbr_to_id, long_df, latest_form = load_context(game_path, team_path, windows=DEFAULT_WINDOWS)
     
     # Vis siste 5 kamper for begge lagene
     display_last_5_games(long_df, home_abbr, away_abbr)
@@ -151,6 +264,7 @@ def predict_match(
         long_df,
         abbr_to_id,
         windows=DEFAULT_WINDOWS,
+        latest_form=latest_form,
     )
 
     probs = model.predict_proba(X_input)[0]
@@ -1,45 +1,62 @@
 # predict_with_odds.py
+from pathlib import Path
+
+import numpy as np
+
 from live.nt_odds import get_nhl_matches_range
-from live.live_feature_builder import build_live_features
-from utils.model_utils import load_model
+from live.live_feature_builder import build_live_features_batch, feature_frame
+from utils.model_utils import load_model_cached, outcome_class_indices, outcome_probs_matrix
 from utils.feature_engineering import DEFAULT_WINDOWS
-from utils.value_utils import expected_value, implied_probability
+from utils.value_utils import (
+    expected_value_matrix,
+    implied_probability_matrix,
+    normalize_probs_matrix,
+)
 
-MODEL_PATH = "models/nhl_model.pkl"
-def normalize_probs(*probs):
-    """Sørger for at summen blir 1."""
-    clean = [p if p is not None else 0.0 for p in probs]
-    total = sum(clean)
-    if total <= 0:
-        return tuple(0.0 for _ in clean)
-    return tuple(p / total for p in clean)
+MODEL_PATH = Path(__file__).resolve().parent / "models" / "nhl_model.pkl"
 
 
-def predict_match(model, home_abbr, away_abbr):
+def predict_probs_matrix(model, matchups):
     """
-    Lager feature-row og får prediksjon fra ML-modellen.
-    Returnerer et dict med sannsynligheter.
+    Lager feature-rader for alle (home_abbr, away_abbr) og kjører én predict_proba
+    for hele listen. Returnerer (N, 3) normaliserte sannsynligheter (hjemme, uavgjort, borte).
     """
+    if not matchups:
+        return np.zeros((0, 3), dtype=np.float64)
 
-    X = build_live_features(away_abbr, home_abbr, windows=DEFAULT_WINDOWS)
-    probs = model.predict_proba(X)[0]
-    class_probs = dict(zip(model.classes_, probs))
+    features = build_live_features_batch(
+        [away_abbr for _, away_abbr in matchups],
+        [home_abbr for home_abbr, _ in matchups],
+        windows=DEFAULT_WINDOWS,
+    )
+    all_probs = outcome_probs_matrix(model.predict_proba(feature_frame(features)), outcome_class_indices(model))
+    return normalize_probs_matrix(all_probs)
 
-    home_prob = class_probs.get(0, 0.0)
-    draw_prob = class_probs.get(1, 0.0)
-    away_prob = class_probs.get(2, 0.0)
 
-    home_prob, draw_prob, away_prob = normalize_probs(home_prob, draw_prob, away_prob)
+def predict_matches(model, matchups):
+    """
+    Som predict_probs_matrix, men med ett dict med sannsynligheter per matchup.
+    """
+    return [
+        {
+            "model_home_win_prob": home_prob,
+            "model_draw_prob": draw_prob,
+            "model_away_win_prob": away_prob,
+        }
+        for home_prob, draw_prob, away_prob in predict_probs_matrix(model, matchups).tolist()
+    ]
+
 
-    return {
-        "model_home_win_prob": home_prob,
-        "model_draw_prob": draw_prob,
-        "model_away_win_prob": away_prob,
-    }
+def predict_match(model, home_abbr, away_abbr):
+    """
+    Lager feature-row og får prediksjon fra ML-modellen.
+    Returnerer et dict med sannsynligheter.
+    """
+    return predict_matches(model, [(home_abbr, away_abbr)])[0]
 
 
 def make_report(days=3):
-    model = load_model(MODEL_PATH)
+    model = load_model_cached(MODEL_PATH)
 
     games = get_nhl_matches_range(days)
     if not games:
@@ -48,31 +65,36 @@ def make_report(days=3):
 
     report = []
 
+    valid_games = []
     for g in games:
-        home = g["home"]
-        away = g["away"]
-        home_abbr = g["home_abbr"]
-        away_abbr = g["away_abbr"]
-
-        if home_abbr is None or away_abbr is None:
+        if g["home_abbr"] is None or g["away_abbr"] is None:
             # fallback i tilfelle mapping failer (skal ikke skje)
-            print(f"[ADVARSEL] Mangler mapping for {home} eller {away}")
+            print(f"[ADVARSEL] Mangler mapping for {g['home']} eller {g['away']}")
             continue
-
-        pred = predict_match(model, home_abbr, away_abbr)
+        valid_games.append(g)
+
+    # Alle feature-rader bygges først, og modellen kalles én gang for hele listen
+    probs = predict_probs_matrix(model, [(g["home_abbr"], g["away_abbr"]) for g in valid_games])
+
+    # Implied og EV for alle kamper og utfall i én vektorisert omgang (NaN = manglende odds)
+    odds = np.array(
+        [[g["odds_home"], g["odds_draw"], g["odds_away"]] for g in valid_games],
+        dtype=np.float64,
+    ).reshape(-1, 3)
+    implied = implied_probability_matrix(odds).tolist()
+    values = expected_value_matrix(probs, odds).tolist()
+
+    # tolist() gir Python-floats; round() (ikke np.round) så verdiene blir som før
+    for g, (prob_H, prob_D, prob_A), (imp_H, imp_D, imp_A), (value_H, value_D, value_A) in zip(
+        valid_games, probs.tolist(), implied, values
+    ):
+        home_abbr = g["home_abbr"]
+        away_abbr = g["away_abbr"]
 
         odds_home = g["odds_home"]
         odds_draw = g["odds_draw"]
         odds_away = g["odds_away"]
 
-        imp_H = implied_probability(odds_home)
-        imp_D = implied_probability(odds_draw)
-        imp_A = implied_probability(odds_away)
-
-        value_H = expected_value(pred["model_home_win_prob"], odds_home)
-        value_D = expected_value(pred["model_draw_prob"], odds_draw)
-        value_A = expected_value(pred["model_away_win_prob"], odds_away)
-
         game_entry = {
             "match": f"{home_abbr} vs {away_abbr}",
             "start": g["startTime"],
@@ -83,19 +105,19 @@ def make_report(days=3):
             "odds_away": odds_away,
 
             # modeled probabilities
-            "model_home_win": round(pred["model_home_win_prob"], 3),
-            "model_draw": round(pred["model_draw_prob"], 3),
-            "model_away_win": round(pred["model_away_win_prob"], 3),
+            "model_home_win": round(prob_H, 3),
+            "model_draw": round(prob_D, 3),
+            "model_away_win": round(prob_A, 3),
 
             # implied probabilities
-            "implied_home_prob": round(imp_H, 3) if imp_H is not None else None,
-            "implied_draw_prob": round(imp_D, 3) if imp_D is not None else None,
-            "implied_away_prob": round(imp_A, 3) if imp_A is not None else None,
+            "implied_home_prob": round(imp_H, 3) if imp_H == imp_H else None,
+            "implied_draw_prob": round(imp_D, 3) if imp_D == imp_D else None,
+            "implied_away_prob": round(imp_A, 3) if imp_A == imp_A else None,
 
             # EV
-            "value_home": round(value_H, 3) if value_H is not None else None,
-            "value_draw": round(value_D, 3) if value_D is not None else None,
-            "value_away": round(value_A, 3) if value_A is not None else None,
+            "value_home": round(value_H, 3) if value_H == value_H else None,
+            "value_draw": round(value_D, 3) if value_D == value_D else None,
+            "value_away": round(value_A, 3) if value_A == value_A else None,
         }
 
         report.append(game_entry)
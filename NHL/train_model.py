@@ -1,4 +1,7 @@
 # train_model.py
+import sys
+
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import (
     accuracy_score,
@@ -15,10 +18,23 @@ from utils.feature_engineering import (
     add_multiwindow_form,
     make_game_feature_frame,
 )
-from utils.model_utils import train_random_forest, save_model, get_feature_importances
+from utils.model_utils import (
+    train_random_forest,
+    train_hist_gradient_boosting,
+    save_model,
+    get_feature_importances,
+)
+
+# python train_model.py [rf|hgb] – RandomForest er standard
+TRAINERS = {
+    "rf": ("Random Forest", train_random_forest),
+    "hgb": ("HistGradientBoosting", train_hist_gradient_boosting),
+}
 
 
-def main():
+def main(model_type: str = "rf"):
+    model_name, train_fn = TRAINERS[model_type]
+
     print("Loading and preparing data...")
     games, id_to_abbr, abbr_to_id = load_and_prepare_games(
         "data/game.csv", "data/team_info.csv"
@@ -33,6 +49,10 @@ def main():
         games, long_df, windows=DEFAULT_WINDOWS
     )
 
+    # Trærne i sklearn regner i float32 uansett; konverter én gang her så fit/predict
+    # slipper sin egen float64 -> float32-kopi (kolonnenavnene beholdes)
+    X = X.astype(np.float32)
+
     print("Splitting into train and test...")
     X_train, X_test, y_train, y_test = train_test_split(
         X,
@@ -42,8 +62,8 @@ def main():
         stratify=y,
     )
 
-    print("Training Random Forest model...")
-    model = train_random_forest(X_train, y_train)
+    print(f"Training {model_name} model...")
+    model = train_fn(X_train, y_train)
 
     print("\n=== Evaluating Model ===")
     preds = model.predict(X_test)
@@ -60,7 +80,7 @@ def main():
     print(classification_report(y_test, preds))
 
     print("\nTop feature importances:")
-    for feat, imp in get_feature_importances(model, feature_cols):
+    for feat, imp in get_feature_importances(model, feature_cols, X_test, y_test):
         print(f"{feat:30s} {imp:.3f}")
 
     print("\nSaving the trained model to 'models/nhl_model.pkl'...")
@@ -69,4 +89,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] not in TRAINERS):
+        print(f"Usage: python train_model.py [{'|'.join(TRAINERS)}]")
+        sys.exit(1)
+    main(sys.argv[1] if len(sys.argv) == 2 else "rf")
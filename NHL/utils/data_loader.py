@@ -1,25 +1,89 @@
 # nhl/data_loader.py
+import hashlib
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from utils.pickle_cache import read_pickle_cache, write_pickle_cache
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 
+# Kolonnene i game.csv som faktisk brukes; venue-/tidssonekolonnene leses ikke
+GAME_COLUMNS = [
+    "game_id",
+    "season",
+    "type",
+    "date_time_GMT",
+    "away_team_id",
+    "home_team_id",
+    "away_goals",
+    "home_goals",
+    "outcome",
+]
+# Smale heltall holder (game_id < 2^31, team_id < 2^15, mål < 128) og halverer minnet
+GAME_DTYPES = {
+    "game_id": np.int32,
+    "away_team_id": np.int16,
+    "home_team_id": np.int16,
+    "away_goals": np.int8,
+    "home_goals": np.int8,
+    "type": "category",
+    "outcome": "object",
+}
+TEAM_COLUMNS = ["team_id", "abbreviation"]
+
+# Ferdig preparerte kamper lagres her mellom kjøringer (se load_and_prepare_games)
+GAMES_CACHE_DIR = DATA_DIR / ".cache"
+
+
+# sti -> funnet fil; bare treff caches, så en fil som dukker opp senere blir funnet
+_resolved_paths = {}
+
 
 def _resolve_path(path: str) -> Path:
     """
     Returnerer en absolutt sti. Prøver først gitt sti, deretter BASE_DIR/data/<filnavn>.
     """
+    key = str(path)
+    cached = _resolved_paths.get(key)
+    if cached is not None:
+        return cached
     p = Path(path)
     if p.is_file():
+        # Absolutt sti, så et senere chdir ikke endrer hvilken fil nøkkelen peker på
+        p = _resolved_paths[key] = p.resolve()
         return p
     fallback = DATA_DIR / p.name
     if fallback.is_file():
+        _resolved_paths[key] = fallback
         return fallback
     return p
 
 
+def encode_outcomes(outcome: pd.Series) -> np.ndarray:
+    """
+    Outcome-tekst -> 0 (hjemmeseier), 1 (OT/SO), 2 (borteseier) eller -1 (ukjent/ikke spilt),
+    regnet kolonnevis med .str-operasjoner i stedet for en Python-funksjon per rad.
+    Ikke-tekst, tom tekst og "tbc" gir -1; OT/SO går foran hjemme/borte.
+    Tekstoperasjonene kjøres bare på de unike verdiene (en håndfull) og mappes tilbake.
+    """
+    codes, uniques = pd.factorize(outcome)
+    o = pd.Series(uniques).str.lower().str.strip().fillna("")
+    unknown = (o == "") | o.str.contains("tbc", regex=False)
+    is_ot = o.str.contains("ot", regex=False) | o.str.contains("so", regex=False)
+    unique_codes = np.select(
+        [unknown, is_ot, o.str.startswith("home win"), o.str.startswith("away win")],
+        [-1, 1, 0, 2],
+        default=-1,
+    )
+    # factorize gir -1 for NaN, som skal bli ukjent
+    return np.append(unique_codes, -1)[codes]
+
+
 def load_and_prepare_games(
     game_path: str = "data/game.csv",
     team_path: str = "data/team_info.csv",
@@ -31,55 +95,92 @@ def load_and_prepare_games(
       - games_df: kampdata med ekstra kolonner
       - id_to_abbr: dict team_id -> 'BOS'
       - abbr_to_id: dict 'BOS' -> team_id
+    Resultatet caches i data/.cache (nøkkel fra størrelse/mtime på filene), så senere
+    kjøringer med uendrede CSV-er leser en pickle i stedet for å parse på nytt.
     """
     game_path_resolved = _resolve_path(game_path)
-    team_path_resolved = _resolve_path(team_path)
-
-    games = pd.read_csv(game_path_resolved)
-    teams = pd.read_csv(team_path_resolved)
 
     # Lag mapping mellom id <-> forkortelse
-    id_to_abbr = dict(zip(teams["team_id"], teams["abbreviation"]))
-    abbr_to_id = dict(zip(teams["abbreviation"], teams["team_id"]))
+    id_to_abbr, abbr_to_id = load_team_mappings(team_path)
+
+    try:
+        key = _games_cache_key(game_path_resolved, _resolve_path(team_path))
+    except OSError:
+        key = None  # manglende fil: _prepare_games gir den vanlige feilen
+    cache_file = GAMES_CACHE_DIR / f"games_{key}.pkl" if key else None
+    if cache_file is not None:
+        games = read_pickle_cache(cache_file)
+        if isinstance(games, pd.DataFrame):
+            return games, id_to_abbr, abbr_to_id
+
+    games = _prepare_games(game_path_resolved, id_to_abbr, abbr_to_id)
+
+    if cache_file is not None:
+        write_pickle_cache(cache_file, games, "games cache", stale_glob="games_*.pkl")
+    return games, id_to_abbr, abbr_to_id
+
+
+def _games_cache_key(game_path: Path, team_path: Path) -> str:
+    """Nøkkel fra størrelse/mtime på CSV-ene og denne filen, så nye data eller ny kode gir ny cache."""
+    parts = []
+    for path in (game_path, team_path, Path(__file__)):
+        st = path.stat()
+        parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.md5("|".join(parts).encode()).hexdigest()
+
 
-    # Legg til hjemme-/bortelag som forkortelser
-    games["home_team"] = games["home_team_id"].map(id_to_abbr)
-    games["away_team"] = games["away_team_id"].map(id_to_abbr)
+def _prepare_games(game_path: Path, id_to_abbr: dict, abbr_to_id: dict) -> pd.DataFrame:
+    games = pd.read_csv(game_path, usecols=GAME_COLUMNS, dtype=GAME_DTYPES)
 
-    # Kun grunnseriekamper
-    games = games[games["type"] == "R"].copy()
-    games = games[~games["outcome"].str.contains("tbc", na=False)].copy()
+    # Legg til hjemme-/bortelag som forkortelser. Felles kategorisk dtype for begge
+    # kolonnene (sortert som før) gir int-koder i groupby/sort og mindre minne.
+    # team_id er små heltall, så kodene hentes med én numpy-indeksering i en
+    # oppslagstabell (team_id -> kategorikode) i stedet for et dict-oppslag per rad.
+    team_dtype = pd.CategoricalDtype(sorted(abbr_to_id))
+    games["home_team"] = _team_categorical(games["home_team_id"].to_numpy(), id_to_abbr, team_dtype)
+    games["away_team"] = _team_categorical(games["away_team_id"].to_numpy(), id_to_abbr, team_dtype)
+
+    # Encode outcome til 0/1/2 (vektorisert, samme regler som før). "tbc" og ukjente
+    # utfall gir -1, så grunnserie + kjent utfall blir én maske på originalrammen,
+    # og bare de beholdte radene kopieres (én gang).
+    outcome_code = encode_outcomes(games["outcome"])
+    rows = np.flatnonzero((games["type"] == "R").to_numpy() & (outcome_code >= 0))
+    games = games.iloc[rows].copy()
 
     # Dato i datetime-format
     games["date"] = pd.to_datetime(games["date_time_GMT"])
+    games["outcome_code"] = outcome_code[rows]
+    return games
 
-    # Encode outcome til 0/1/2
-    def encode_outcome(o: str) -> int:
-        if not isinstance(o, str):
-            return -1
-        o = o.lower().strip()
-        if not o or "tbc" in o:
-            return -1  # kamp ikke spilt/ukjent label
-        if "ot" in o or "so" in o:
-            return 1  # uavgjort-type for OT/SO
-        if o.startswith("home win"):
-            return 0  # hjemmeseier
-        if o.startswith("away win"):
-            return 2  # borteseier
-        return -1  # ukjent label droppes senere
-
-    games["outcome_code"] = games["outcome"].apply(encode_outcome)
-    games = games[games["outcome_code"] >= 0].copy()
 
-    return games, id_to_abbr, abbr_to_id
+def _team_categorical(team_ids: np.ndarray, id_to_abbr: dict, team_dtype: pd.CategoricalDtype) -> pd.Categorical:
+    """team_id-er -> kategoriske forkortelser; ukjente id-er blir NaN som med Series.map."""
+    ids = {int(tid): team_dtype.categories.get_loc(abbr) for tid, abbr in id_to_abbr.items()}
+    lookup = np.full(max(ids, default=-1) + 2, -1, dtype=np.int16)  # siste plass: utenfor tabellen
+    lookup[list(ids)] = list(ids.values())
+    team_ids = team_ids.astype(np.int64)
+    in_range = (team_ids >= 0) & (team_ids < len(lookup) - 1)
+    codes = lookup[np.where(in_range, team_ids, len(lookup) - 1)]
+    return pd.Categorical.from_codes(codes, dtype=team_dtype)
 
 
 def load_team_mappings(team_path: str = "data/team_info.csv"):
     """
     Leser kun team-info for å mappe mellom id og forkortelser.
+    Filen leses én gang per (sti, mtime); kallere får egne kopier av dictene.
     """
     team_path_resolved = _resolve_path(team_path)
-    teams = pd.read_csv(team_path_resolved)
+    try:
+        mtime_ns = team_path_resolved.stat().st_mtime_ns
+    except OSError:
+        mtime_ns = None  # lar read_csv gi den vanlige feilen for manglende fil
+    id_to_abbr, abbr_to_id = _read_team_mappings(str(team_path_resolved.resolve()), mtime_ns)
+    return dict(id_to_abbr), dict(abbr_to_id)
+
+
+@lru_cache(maxsize=4)
+def _read_team_mappings(team_path: str, mtime_ns):
+    teams = pd.read_csv(team_path, usecols=TEAM_COLUMNS)
     id_to_abbr = dict(zip(teams["team_id"], teams["abbreviation"]))
     abbr_to_id = dict(zip(teams["abbreviation"], teams["team_id"]))
     return id_to_abbr, abbr_to_id
@@ -1,5 +1,6 @@
+import numpy as np
 import pandas as pd
-from typing import Iterable, List, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
 
 DEFAULT_WINDOWS: Sequence[int] = (5, 20)
 
@@ -15,50 +16,42 @@ def build_team_long_df(games: pd.DataFrame) -> pd.DataFrame:
       - goals_against
       - win (bool/int)
       - date
+    team er kategorisk, is_home/win er int8.
     """
-    rows = []
-    for _, row in games.iterrows():
-        game_id = row["game_id"]
-
-        # Hjemmelag
-        rows.append(
-            {
-                "game_id": game_id,
-                "team": row["home_team"],
-                "is_home": 1,
-                "goals_for": row["home_goals"],
-                "goals_against": row["away_goals"],
-                "win": int(row["home_goals"] > row["away_goals"]),
-                "date": row["date"],
-            }
-        )
-
-        # Bortelag
-        rows.append(
-            {
-                "game_id": game_id,
-                "team": row["away_team"],
-                "is_home": 0,
-                "goals_for": row["away_goals"],
-                "goals_against": row["home_goals"],
-                "win": int(row["away_goals"] > row["home_goals"]),
-                "date": row["date"],
-            }
-        )
-
-    long_df = pd.DataFrame(rows)
+    # Kolonnevis i stedet for iterrows: rad 2i er hjemmelaget og 2i+1 bortelaget i kamp i,
+    # samme rekkefølge (og indeks) som da radene ble bygget én og én.
+    home_goals = games["home_goals"].to_numpy()
+    away_goals = games["away_goals"].to_numpy()
+    teams = np.column_stack(
+        [games["home_team"].astype(object).to_numpy(), games["away_team"].astype(object).to_numpy()]
+    ).ravel()
+    # Lag som kategori (kode per rad i stedet for en Python-streng); kategoriene er sortert,
+    # så sortering og sammenligning med forkortelser gir samme resultat som før
+    team_dtype = games["home_team"].dtype
+    if not isinstance(team_dtype, pd.CategoricalDtype) or team_dtype != games["away_team"].dtype:
+        team_dtype = pd.CategoricalDtype(sorted(pd.unique(teams[pd.notna(teams)])))
+
+    long_df = pd.DataFrame(
+        {
+            "game_id": np.repeat(games["game_id"].to_numpy(), 2),
+            "team": pd.Categorical(teams, dtype=team_dtype),
+            "is_home": np.tile(np.array([1, 0], dtype=np.int8), len(games)),
+            "goals_for": np.column_stack([home_goals, away_goals]).ravel(),
+            "goals_against": np.column_stack([away_goals, home_goals]).ravel(),
+            "win": np.column_stack([home_goals > away_goals, away_goals > home_goals])
+            .ravel()
+            .astype(np.int8),
+            "date": games["date"].repeat(2).reset_index(drop=True),
+        }
+    )
     long_df.sort_values(["team", "date"], inplace=True)
     return long_df
 
 
 def _fill_form_na(long_df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
-    """Fyller NaN i form-kolonner med nøytrale verdier."""
-    for col in columns:
-        if "win_rate" in col:
-            long_df[col] = long_df[col].fillna(0.5)
-        else:
-            long_df[col] = long_df[col].fillna(0.0)
-    return long_df
+    """Fyller NaN i form-kolonner med nøytrale verdier (én fillna for alle kolonnene)."""
+    fill_values = {col: 0.5 if "win_rate" in col else 0.0 for col in columns}
+    return long_df.fillna(fill_values)
 
 
 def add_multiwindow_form(
@@ -72,43 +65,42 @@ def add_multiwindow_form(
       - form_win_rate_w{n}
 
     Merk: vi shifter én kamp for å unngå å bruke nåværende kamp i feature-settet.
+    Snittene regnes med prefiks-summer innenfor hvert lag, så vinduet aldri går
+    over i et annet lags kamper.
     """
     long_df = long_df.sort_values(["team", "date"]).copy()
-    grouped = long_df.groupby("team", group_keys=False)
-    form_cols = []
 
+    # Etter sorteringen ligger hvert lag sammenhengende; posisjon i laget = antall tidligere kamper
+    team = long_df["team"].to_numpy()
+    n_rows = len(team)
+    idx = np.arange(n_rows)
+    new_team = np.ones(n_rows, dtype=bool)
+    new_team[1:] = team[1:] != team[:-1]  # NaN != NaN: lagløse rader blir egne grupper uten historikk
+    team_start = np.maximum.accumulate(np.where(new_team, idx, 0)) if n_rows else idx
+    games_before = idx - team_start
+
+    # Prefiks-sum per metrikk: summen av kampene [i - n, i) er csum[i] - csum[i - n]
+    prefix_sums = {}
+    for metric in ("goals_for", "goals_against", "win"):
+        csum = np.zeros(n_rows + 1, dtype=np.float64)
+        np.cumsum(long_df[metric].to_numpy(dtype=np.float64), out=csum[1:])
+        prefix_sums[metric] = csum
+
+    form_cols = []
     for w in windows:
-        goals_for = (
-            grouped["goals_for"]
-            .shift(1)
-            .rolling(w, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True)
-        )
-        goals_against = (
-            grouped["goals_against"]
-            .shift(1)
-            .rolling(w, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True)
-        )
-        win_rate = (
-            grouped["win"]
-            .shift(1)
-            .rolling(w, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True)
-        )
-
-        gf_col = f"form_goals_for_w{w}"
-        ga_col = f"form_goals_against_w{w}"
-        wr_col = f"form_win_rate_w{w}"
-
-        long_df[gf_col] = goals_for
-        long_df[ga_col] = goals_against
-        long_df[wr_col] = win_rate
-
-        form_cols.extend([gf_col, ga_col, wr_col])
+        count = np.minimum(games_before, w)
+        has_history = count > 0
+        for metric, name in (
+            ("goals_for", "form_goals_for"),
+            ("goals_against", "form_goals_against"),
+            ("win", "form_win_rate"),
+        ):
+            csum = prefix_sums[metric]
+            mean = np.full(n_rows, np.nan)
+            np.divide(csum[idx] - csum[idx - count], count, out=mean, where=has_history)
+            col = f"{name}_w{w}"
+            long_df[col] = mean.astype(np.float32)
+            form_cols.append(col)
 
     long_df = _fill_form_na(long_df, form_cols)
     return long_df
@@ -177,30 +169,68 @@ def make_game_feature_frame(
 
     feature_cols = get_feature_columns(windows)
 
-    X = merged[feature_cols]
+    # float32 for form og int32 for team_id: halvparten av minnet, og trærne regner i float32 uansett
+    X = merged[feature_cols].astype(
+        {
+            **{col: np.float32 for col in feature_cols if "_form_" in col},
+            "home_team_id": np.int32,
+            "away_team_id": np.int32,
+        }
+    )
     y = merged["outcome_code"]
 
     return X, y, merged, feature_cols
 
 
+def _empty_team_form(windows: Sequence[int]) -> dict:
+    """Nøytral form for lag uten kamper (samme verdier som _fill_form_na)."""
+    empty_form = {}
+    for w in windows:
+        empty_form[f"form_goals_for_w{w}"] = 0.0
+        empty_form[f"form_goals_against_w{w}"] = 0.0
+        empty_form[f"form_win_rate_w{w}"] = 0.5
+    return empty_form
+
+
+def get_latest_team_forms(
+    long_df_with_form: pd.DataFrame,
+    windows: Sequence[int] = DEFAULT_WINDOWS,
+) -> Dict[str, dict]:
+    """
+    'Siste form' for alle lag på én gang: team -> dict med form-kolonnene fra lagets
+    siste kamp. Én sortering + groupby.tail i stedet for filter + sort per oppslag.
+    """
+    form_cols = list(_empty_team_form(windows))
+    latest = (
+        long_df_with_form.sort_values("date", kind="stable")
+        .groupby("team", sort=False, observed=True)
+        .tail(1)
+    )
+    return {
+        team: dict(zip(form_cols, values))
+        for team, values in zip(latest["team"], latest[form_cols].itertuples(index=False, name=None))
+    }
+
+
 def get_latest_team_form(
     long_df_with_form: pd.DataFrame,
     team_abbr: str,
     windows: Sequence[int] = DEFAULT_WINDOWS,
+    latest_form: Optional[Dict[str, dict]] = None,
 ) -> dict:
     """
     Henter 'siste form' for et lag basert på rolling-kolonnene.
     Brukes i predict.py så vi bruker nøyaktig samme logikk som i trening.
+    Med `latest_form` (fra get_latest_team_forms) blir oppslaget et dict-oppslag.
     """
+    if latest_form is not None:
+        form = latest_form.get(team_abbr)
+        return dict(form) if form is not None else _empty_team_form(windows)
+
     t = long_df_with_form[long_df_with_form["team"] == team_abbr]
 
     if t.empty:
-        empty_form = {}
-        for w in windows:
-            empty_form[f"form_goals_for_w{w}"] = 0.0
-            empty_form[f"form_goals_against_w{w}"] = 0.0
-            empty_form[f"form_win_rate_w{w}"] = 0.5
-        return empty_form
+        return _empty_team_form(windows)
 
     last_row = t.sort_values("date").iloc[-1]
 
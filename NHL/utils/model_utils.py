@@ -1,10 +1,13 @@
 # nhl/model_utils.py
 import os
-import pickle
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Sequence, Tuple
 
-from sklearn.ensemble import RandomForestClassifier
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.inspection import permutation_importance
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 MODELS_DIR = BASE_DIR / "models"
@@ -41,31 +44,109 @@ def train_random_forest(X_train, y_train) -> RandomForestClassifier:
     return model
 
 
-def save_model(model, path: str = "models/nhl_model.pkl") -> None:
+def train_hist_gradient_boosting(X_train, y_train) -> HistGradientBoostingClassifier:
     """
-    Lagrer modellen til disk med pickle.
+    Alternativ til RandomForest: gradient boosting på features binnet til uint8.
+    Trener flere ganger raskere, men ga litt lavere accuracy enn RF på vårt datasett.
+    """
+    model = HistGradientBoostingClassifier(
+        max_iter=400,
+        max_depth=8,
+        learning_rate=0.05,
+        early_stopping=True,
+        validation_fraction=0.1,
+        random_state=42,
+        class_weight={0: 1.0, 1: 0.95, 2: 1.0},  # samme vekter som RF
+    )
+    model.fit(X_train, y_train)
+    return model
+
+
+def save_model(model, path: str = "models/nhl_model.pkl", compress=3) -> None:
+    """
+    Lagrer modellen til disk med joblib. Trærnes numpy-arrays skrives som hele blokker,
+    og zlib-kompresjon (nivå 3) gjør filen ca. 4-5x mindre enn en ren pickle.
     """
     resolved = _resolve_model_path(path)
     os.makedirs(resolved.parent, exist_ok=True)
-    with open(resolved, "wb") as f:
-        pickle.dump(model, f)
+    joblib.dump(model, resolved, compress=compress)
 
 
 def load_model(path: str = "models/nhl_model.pkl"):
     """
-    Laster en tidligere trent modell.
+    Laster en tidligere trent modell. joblib.load leser også modeller lagret med ren pickle.
     """
     resolved = _resolve_model_path(path)
-    with open(resolved, "rb") as f:
-        return pickle.load(f)
+    return joblib.load(resolved)
+
+
+def load_model_cached(path: str = "models/nhl_model.pkl"):
+    """
+    Som load_model, men lastes kun på nytt når modellfilen endres (mtime er del av
+    cache-nøkkelen). Instansen deles mellom kallere i samme prosess og må ikke endres.
+    """
+    resolved = _resolve_model_path(path)
+    return _load_model_by_mtime(str(resolved), resolved.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=2)
+def _load_model_by_mtime(path: str, mtime_ns: int):
+    return load_model(path)
 
 
-def get_feature_importances(model, feature_names: List[str]):
+def check_feature_columns(model, feature_names: List[str]):
+    """
+    Sjekker ved innlasting at modellen er trent på `feature_names` i samme rekkefølge,
+    så en utdatert modell feiler med én gang i stedet for ved første prediksjon.
+    Modellen endres ikke; den skal få DataFrames med disse kolonnene (se feature_frame).
+    """
+    fitted = getattr(model, "feature_names_in_", None)
+    if fitted is not None and list(fitted) != list(feature_names):
+        raise ValueError(
+            "Modellens features matcher ikke forventet kolonnerekkefølge: "
+            f"{list(fitted)} != {list(feature_names)}"
+        )
+    return model
+
+
+def outcome_class_indices(model, outcomes: Sequence[int] = (0, 1, 2)) -> Tuple[int, ...]:
+    """
+    Posisjonen til hvert utfall (0=H, 1=OT, 2=B) i model.classes_, -1 hvis klassen mangler.
+    Regnes én gang ved innlasting i stedet for dict(zip(classes_, probs)) per prediksjon.
+    """
+    class_to_idx = {int(c): i for i, c in enumerate(model.classes_)}
+    return tuple(class_to_idx.get(o, -1) for o in outcomes)
+
+
+def probs_by_outcome(probs, class_indices: Sequence[int]) -> Tuple[float, ...]:
+    """Plukker ut sannsynlighet per utfall med indeksene fra outcome_class_indices."""
+    return tuple(float(probs[i]) if i >= 0 else 0.0 for i in class_indices)
+
+
+def outcome_probs_matrix(all_probs, class_indices: Sequence[int]) -> np.ndarray:
+    """(N, n_classes) fra predict_proba -> (N, 3) i H/OT/B-rekkefølge, 0.0 for manglende klasser."""
+    all_probs = np.asarray(all_probs, dtype=np.float64)
+    out = np.zeros((len(all_probs), len(class_indices)), dtype=np.float64)
+    for j, i in enumerate(class_indices):
+        if i >= 0:
+            out[:, j] = all_probs[:, i]
+    return out
+
+
+def get_feature_importances(model, feature_names: List[str], X=None, y=None):
     """
     Returnerer feature importance som liste av (feature, importance),
-    sortert synkende.
+    sortert synkende. Modeller uten feature_importances_ (f.eks. HistGradientBoosting)
+    får permutation importance på (X, y), eller en tom liste uten data.
     """
-    importances = model.feature_importances_
-    return sorted(
-        zip(feature_names, importances), key=lambda x: x[1], reverse=True
-    )
+    importances = getattr(model, "feature_importances_", None)
+    if importances is None:
+        if X is None or y is None:
+            return []
+        importances = permutation_importance(
+            model, X, y, n_repeats=5, random_state=42
+        ).importances_mean
+    importances = np.asarray(importances, dtype=np.float64)
+    # Stabil sortering på -importance: samme rekkefølge som sorted(..., reverse=True) ved likhet
+    order = np.argsort(-importances, kind="stable")
+    return [(feature_names[i], float(importances[i])) for i in order]
@@ -0,0 +1,58 @@
+# nhl/pickle_cache.py
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+
+def read_pickle_cache(path: Path, default: Any = None) -> Any:
+    """
+    Leser en cache-fil med pickle. Returnerer `default` når filen mangler eller ikke
+    kan leses – også når den er skrevet med en annen pandas-/numpy-versjon
+    (ModuleNotFoundError, ImportError, TypeError osv.), så kalleren bare bygger på nytt.
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return default
+
+
+def write_pickle_cache(
+    path: Path,
+    obj: Any,
+    description: str = "cache",
+    stale_glob: Optional[str] = None,
+) -> bool:
+    """
+    Skriver `obj` til `path` via en temp-fil i samme mappe + os.replace, så en avbrutt
+    kjøring aldri etterlater en halv cache. Temp-filen slettes ved alle feil.
+    Med `stale_glob` fjernes andre filer i mappen som matcher mønsteret (gamle nøkler).
+    Feil skrives ut og gir False; cachen er aldri nødvendig for å fullføre kjøringen.
+    """
+    path = Path(path)
+    tmp_name = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_name = tmp.name
+            pickle.dump(obj, tmp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, path)
+        tmp_name = None
+        if stale_glob:
+            for old in path.parent.glob(stale_glob):
+                if old != path:
+                    old.unlink(missing_ok=True)
+        return True
+    except Exception as exc:
+        print(f"Warning: Could not write {description}: {exc}")
+        return False
+    finally:
+        if tmp_name is not None:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
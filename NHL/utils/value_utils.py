@@ -1,4 +1,17 @@
-from typing import Optional
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Kolonnerekkefølgen i matrisene under: hjemme, uavgjort, borte
+OUTCOME_KEYS = ("home", "draw", "away")
+
+# Rapportfeltene per utfall: (odds, modell-sannsynlighet, implied, value).
+# Slås opp én gang per kamp i stedet for å bygge fire dicts per rad.
+SELECTION_FIELDS = {
+    "home": ("odds_home", "model_home_win", "implied_home_prob", "value_home"),
+    "draw": ("odds_draw", "model_draw", "implied_draw_prob", "value_draw"),
+    "away": ("odds_away", "model_away_win", "implied_away_prob", "value_away"),
+}
 
 
 def implied_probability(odds: Optional[float]) -> Optional[float]:
@@ -24,3 +37,64 @@ def round_optional(value: Optional[float], decimals: int = 5) -> Optional[float]
         return round(float(value), decimals)
     except (TypeError, ValueError):
         return None
+
+
+def optional_float(value) -> Optional[float]:
+    """numpy-verdi -> float, NaN -> None (for JSON-respons)."""
+    value = float(value)
+    return None if value != value else value
+
+
+def implied_probability_matrix(odds) -> np.ndarray:
+    """Vektorisert implied_probability: rå 1/odds, NaN der oddsen mangler eller er <= 1e-9."""
+    odds = np.asarray(odds, dtype=np.float64)
+    implied = np.full_like(odds, np.nan)
+    # reciprocal med where: ingen skalar-grener per odds, NaN blir stående der oddsen mangler
+    np.reciprocal(odds, out=implied, where=odds > 1e-9)  # NaN gir False
+    return implied
+
+
+def expected_value_matrix(probs, odds) -> np.ndarray:
+    """Vektorisert expected_value per celle: p * odds - 1, NaN der oddsen mangler."""
+    probs = np.asarray(probs, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+    return np.where(odds > 1e-9, probs * odds - 1.0, np.nan)
+
+
+def normalize_probs_matrix(probs) -> np.ndarray:
+    """Normaliserer hver rad til sum 1; rader med sum <= 0 blir 0."""
+    probs = np.asarray(probs, dtype=np.float64)
+    total = probs.sum(axis=1, keepdims=True)
+    probs_norm = np.zeros_like(probs)
+    np.divide(probs, total, out=probs_norm, where=total > 0)
+    return probs_norm
+
+
+def evaluate_value_matrix(
+    probs, odds
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Normaliserte sannsynligheter, implied og EV for N kamper samtidig.
+    probs: (N, 3) modell-sannsynligheter, odds: (N, 3) med NaN/None for manglende odds,
+    begge i OUTCOME_KEYS-rekkefølge.
+
+    Returnerer (probs_norm, implied, value, best_idx):
+      - implied er rå 1/odds, NaN der oddsen mangler
+      - value er EV (p * odds - 1), NaN for kamper uten komplette odds
+      - best_idx er indeksen til høyeste EV, -1 når oddsen ikke er komplett
+    """
+    probs = np.asarray(probs, dtype=np.float64).reshape(-1, 3)
+    odds = np.asarray(odds, dtype=np.float64).reshape(-1, 3)
+
+    probs_norm = normalize_probs_matrix(probs)
+
+    implied = implied_probability_matrix(odds)
+
+    complete = (odds > 1e-9).all(axis=1)  # NaN gir False
+    value = np.where(complete[:, None], probs_norm * odds - 1.0, np.nan)
+    best_idx = np.where(
+        complete,
+        np.argmax(np.where(complete[:, None], value, -np.inf), axis=1),
+        -1,
+    )
+    return probs_norm, implied, value, best_idx